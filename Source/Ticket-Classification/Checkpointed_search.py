@@ -0,0 +1,128 @@
+import json
+import os
+import socket
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, check_cv
+from Search_common import fit_and_score_rows, rank_candidates, take_rows
+
+
+# Directory of the checkpoints of the searches, one directory per search with an append-only .jsonl file per process
+CHECKPOINT_DIR = "/home/users/elicina/Master-Thesis/Models/Search-Checkpoints"
+
+
+# Record of one fit of the candidate on the fold. With checkpoint_dir the process appends the record to its own
+# file of the directory as soon as the fit is done.
+def fit_and_score(estimator, candidate, params, fold, X, y, train_pos, test_pos, scoring, checkpoint_dir=None):
+    # A failing candidate scores nan like with GridSearchCV, it is recorded and not fitted again on a restart
+    score, fit_seconds, score_seconds, error = fit_and_score_rows(
+        clone(estimator).set_params(**params), take_rows(X, train_pos), take_rows(y, train_pos),
+        take_rows(X, test_pos), take_rows(y, test_pos), scoring)
+    record = {'candidate': candidate, 'fold': fold, 'params': params, 'error': error, 'score': score,
+              'fit_seconds': fit_seconds, 'score_seconds': score_seconds}
+    if checkpoint_dir is not None:
+        with open(os.path.join(checkpoint_dir, f'{socket.gethostname()}_{os.getpid()}.jsonl'), 'a') as f:
+            append_record(f, record)
+    return record
+
+
+# Key of a search, the same estimator, grid, splitter, scoring and data give the same key in every process
+def search_key(estimator, candidates, cv, scoring, X, y):
+    return joblib.hash((estimator, candidates, repr(cv), scoring, X, y))
+
+
+# Fit records of a .jsonl file by (candidate, fold), the last line may be cut off by the end of the job
+def read_records(path):
+    records = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record['candidate'], record['fold']] = record
+    return records
+
+
+# Fit records of all .jsonl files of a directory by (candidate, fold)
+def read_record_dir(path):
+    records = {}
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.jsonl'):
+                records.update(read_records(os.path.join(path, name)))
+    return records
+
+
+# Append a fit record, it is on disk when the call returns
+def append_record(f, record):
+    f.write(json.dumps(record, default=repr) + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# cv_results_ and the best candidate from the records of all (candidate, fold) fits, in (candidate, fold) order
+# whatever the order the fits finished in
+def search_results(records, candidates, n_splits):
+    scores = np.array([[records[candidate, fold]['score'] for fold in range(n_splits)]
+                       for candidate in range(len(candidates))])
+    fit_seconds = np.array([[records[candidate, fold]['fit_seconds'] for fold in range(n_splits)]
+                            for candidate in range(len(candidates))])
+    return rank_candidates(candidates, scores, fit_seconds)
+
+
+# Grid search that survives the end of a SLURM job, used like GridSearchCV.
+# Every finished (candidate, fold) fit is appended with its score and timings to a checkpoint as soon as it
+# completes: the worker process that fitted it appends it to its own file of the checkpoint directory, no process
+# waits for the others. The directory is named after a hash of the estimator, the grid, the splitter, the scoring and
+# the data, so a restarted search with the same setup reads it, skips the finished fits and only runs the missing
+# ones. The ranking is computed from the checkpoint in (candidate, fold) order, the same as the one of an
+# uninterrupted run.
+class CheckpointedSearchCV:
+    def __init__(self, estimator, param_grid, checkpoint_dir=CHECKPOINT_DIR, cv=5, scoring=None, n_jobs=-1,
+                 verbose=0, refit=True):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.checkpoint_dir = checkpoint_dir
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.refit = refit
+
+    def checkpoint_path(self, X, y):
+        key = search_key(self.estimator, list(ParameterGrid(self.param_grid)), self.cv, self.scoring, X, y)
+        return os.path.join(self.checkpoint_dir, f'search_{key}')
+
+    def fit(self, X, y):
+        candidates = list(ParameterGrid(self.param_grid))
+        cv = check_cv(self.cv, y, classifier=True)
+        splits = list(cv.split(X, y))
+        path = self.checkpoint_path(X, y)
+        os.makedirs(path, exist_ok=True)
+
+        records = read_record_dir(path)
+        pending = [(candidate, fold) for candidate in range(len(candidates)) for fold in range(len(splits))
+                   if (candidate, fold) not in records]
+        self.n_resumed_ = len(candidates) * len(splits) - len(pending)
+        print(f"Checkpoint {path}: {self.n_resumed_} of {len(candidates) * len(splits)} fits done, "
+              f"{len(pending)} to run")
+
+        # Each fit is on disk as soon as its worker is done, the job can end at any time
+        results = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(fit_and_score)(self.estimator, candidate, candidates[candidate], fold, X, y, *splits[fold],
+                                   self.scoring, path)
+            for candidate, fold in pending)
+        for record in results:
+            records[record['candidate'], record['fold']] = record
+
+        self.cv_results_, self.best_index_ = search_results(records, candidates, len(splits))
+        self.n_splits_ = len(splits)
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
@@ -17,8 +17,11 @@ other_directory_path = os.path.abspath('/home/users/elicina/Master-Thesis/Source
 # Add the directory to sys.path
 sys.path.append(other_directory_path)
 
-#import Tokenization 
-from Tokenization import *
+# Only the Word2Vec embeddings are built, the TF-IDF features of Tokenization are not needed here
+from Tokenization import get_word2vec_features, get_labels, smote
+
+train_embeddings, test_embeddings = get_word2vec_features()
+train_labels, test_labels = get_labels()
 
 
 X_train, X_val, Y_train, Y_val = train_test_split(train_embeddings, train_labels, test_size=0.1, random_state=42, shuffle=True)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+
+# Directory of the persisted split index arrays and their manifest
+SPLIT_DIR = "/home/users/elicina/Master-Thesis/Dataset/Splits"
+
+# Named splits, the positions are computed once and reused by every script.
+# val_size is taken from the training part, like the second train_test_split of the LLM scripts.
+# 'holdout_20' is the former split of the W2V / DL scripts, only kept to reproduce their earlier results.
+SPLITS = {
+    'holdout_30': {'test_size': 0.3, 'val_size': 0.1, 'random_state': 42},
+    'holdout_20': {'test_size': 0.2, 'val_size': 0.1, 'random_state': 42},
+}
+
+# The split of all experiments (ML, W2V / DL and LLM models): every model is tested on the same rows
+CANONICAL_SPLIT = 'holdout_30'
+
+
+# Fingerprint of the labels, a different dataset or row order invalidates the persisted split
+def labels_fingerprint(labels):
+    values = np.asarray(labels)
+    if values.dtype == object:
+        values = values.astype(str)
+    values = np.ascontiguousarray(values)
+    return hashlib.sha1(values.tobytes()).hexdigest()
+
+
+# Positions of the train/val/test rows, identical to train_test_split on the data itself
+def compute_split(n_rows, test_size, val_size, random_state):
+    positions = np.arange(n_rows)
+    train_pos, test_pos = train_test_split(positions, test_size=test_size, random_state=random_state, shuffle=True)
+    fit_pos, val_pos = train_test_split(train_pos, test_size=val_size, random_state=random_state, shuffle=True)
+    return {'train': train_pos, 'fit': fit_pos, 'val': val_pos, 'test': test_pos}
+
+
+def _manifest_path(split_dir):
+    return os.path.join(split_dir, 'manifest.json')
+
+
+def _read_manifest(split_dir):
+    if not os.path.exists(_manifest_path(split_dir)):
+        return {}
+    with open(_manifest_path(split_dir)) as f:
+        return json.load(f)
+
+
+# Load the named split, it is computed and persisted on first use.
+# Returns a dict of position arrays: 'train' (= 'fit' + 'val'), 'fit', 'val' and 'test'.
+def load_split(name, labels, split_dir=SPLIT_DIR):
+    if name not in SPLITS:
+        raise KeyError(f"Unknown split '{name}', available splits: {sorted(SPLITS)}")
+    config = SPLITS[name]
+    fingerprint = labels_fingerprint(labels)
+
+    manifest = _read_manifest(split_dir)
+    entry = manifest.get(name)
+    if entry and entry['n_rows'] == len(labels) and entry['fingerprint'] == fingerprint and entry['config'] == config:
+        return {part: np.load(os.path.join(split_dir, file_name)) for part, file_name in entry['files'].items()}
+
+    split = compute_split(len(labels), **config)
+
+    os.makedirs(split_dir, exist_ok=True)
+    files = {}
+    for part, positions in split.items():
+        files[part] = f'{name}_{part}.npy'
+        np.save(os.path.join(split_dir, files[part]), positions)
+
+    # Re-read the manifest right before writing so splits saved meanwhile by other scripts are kept
+    manifest = _read_manifest(split_dir)
+    manifest[name] = {'n_rows': len(labels), 'fingerprint': fingerprint, 'config': config, 'files': files}
+    tmp_path = _manifest_path(split_dir) + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(split_dir))
+    return split
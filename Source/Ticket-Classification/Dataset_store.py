@@ -0,0 +1,65 @@
+import os
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# The columnar store sits next to the CSV with the same name and a .parquet extension
+def store_path(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def csv_path(path):
+    return os.path.splitext(path)[0] + '.csv'
+
+
+# Size and modification time of the CSV, a regenerated CSV has another fingerprint
+def csv_fingerprint(csv_file):
+    stat = os.stat(csv_file)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+# Write the dataset as a compressed Parquet store, row groups keep partial reads cheap.
+# The fingerprint of the CSV next to it is recorded in the store, the store is written under a temporary name first.
+def save_dataset(df, path, compression='zstd', row_group_size=50000):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if os.path.exists(csv_path(path)):
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'source_csv'] = csv_fingerprint(csv_path(path)).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+    tmp_file = f'{store_path(path)}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp_file, compression=compression, row_group_size=row_group_size)
+    os.replace(tmp_file, store_path(path))
+
+
+# A store is stale when the CSV next to it was regenerated after it was written
+def is_stale(path):
+    if not os.path.exists(csv_path(path)):
+        return False
+    recorded = (pq.read_schema(store_path(path)).metadata or {}).get(b'source_csv')
+    if recorded is None:
+        return os.path.getmtime(csv_path(path)) > os.path.getmtime(store_path(path))
+    return recorded.decode('utf-8') != csv_fingerprint(csv_path(path))
+
+
+# Load only the requested columns, the Parquet file is memory-mapped instead of read into a buffer.
+# A stale store is rebuilt from the CSV first. Without a Parquet store the CSV is used, still parsing only the
+# requested columns.
+def load_dataset(path, columns=None):
+    parquet_file = store_path(path)
+    if os.path.exists(parquet_file):
+        if is_stale(path):
+            print(f"{csv_path(path)} is newer than {parquet_file}, rebuilding the store")
+            save_dataset(pd.read_csv(csv_path(path)), path)
+        return pq.read_table(parquet_file, columns=columns, memory_map=True).to_pandas()
+
+    df = pd.read_csv(csv_path(path), usecols=columns)
+    return df if columns is None else df[columns]
+
+
+if __name__ == '__main__':
+    # Convert an existing CSV, e.g. python Dataset_store.py /home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv
+    for csv_file in sys.argv[1:]:
+        save_dataset(pd.read_csv(csv_file), csv_file)
+        print(f"Written {store_path(csv_file)}")
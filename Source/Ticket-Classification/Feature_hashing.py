@@ -0,0 +1,118 @@
+import sys
+import time
+import tracemalloc
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.svm import LinearSVC
+from Sharded_vectorizer import ShardedCountVectorizer
+
+
+# Feature modes of the 'count' step of the TF-IDF pipelines, both are followed by the TfidfTransformer ('tf') step.
+# 'vocabulary' is the CountVectorizer building a vocabulary over the corpus (fitted in parallel shards with n_jobs),
+# 'hashing' maps the tokens to a fixed number of columns without any vocabulary.
+FEATURE_MODES = ('vocabulary', 'hashing')
+
+
+def _hash_chunk(vectorizer, texts):
+    return vectorizer.transform(texts)
+
+
+# Stateless term counts by feature hashing, the transform is split in chunks hashed in parallel processes.
+# The raw counts (no sign flipping, no normalisation) are left to the TfidfTransformer for the IDF weighting.
+class ParallelHashingVectorizer(BaseEstimator, TransformerMixin):
+    def __init__(self, n_features=2 ** 20, n_jobs=1, chunk_size=10000):
+        self.n_features = n_features
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
+    def _vectorizer(self):
+        return HashingVectorizer(n_features=self.n_features, alternate_sign=False, norm=None)
+
+    # Nothing to learn, fit only exists for the pipelines
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X, y=None):
+        texts = list(X)
+        vectorizer = self._vectorizer()
+        if self.n_jobs == 1 or len(texts) <= self.chunk_size:
+            return vectorizer.transform(texts)
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        parts = Parallel(n_jobs=self.n_jobs)(delayed(_hash_chunk)(vectorizer, chunk) for chunk in chunks)
+        return sp.vstack(parts, format='csr')
+
+
+# The 'count' step for the configured feature mode
+def create_vectorizer(feature_mode='vocabulary', n_jobs=1):
+    if feature_mode == 'vocabulary':
+        return ShardedCountVectorizer(n_jobs=n_jobs)
+    if feature_mode == 'hashing':
+        return ParallelHashingVectorizer(n_jobs=n_jobs)
+    raise ValueError(f"Unknown feature mode '{feature_mode}', available modes: {FEATURE_MODES}")
+
+
+def sparse_nbytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+# Peak of the Python and numpy allocations of a sequential fit of the feature mode, this includes the vocabulary
+# dict. tracemalloc only sees this process, the shards and chunks of a parallel fit would not be counted.
+def fit_peak_mb(feature_mode, train_texts):
+    tracemalloc.start()
+    TfidfTransformer().fit_transform(create_vectorizer(feature_mode, n_jobs=1).fit_transform(train_texts))
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return peak_mb
+
+
+# Memory, speed and accuracy of the feature modes on the same split, with a linear SVM on top.
+# The times are of the fit with n_jobs, the memory peak of a separate fit with one job.
+def benchmark_feature_modes(train_texts, train_labels, test_texts, test_labels, n_jobs=-1):
+    results = []
+    for feature_mode in FEATURE_MODES:
+        count_vect = create_vectorizer(feature_mode, n_jobs=n_jobs)
+        tfidf_transformer = TfidfTransformer()
+
+        start = time.perf_counter()
+        X_train = tfidf_transformer.fit_transform(count_vect.fit_transform(train_texts))
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        X_test = tfidf_transformer.transform(count_vect.transform(test_texts))
+        transform_seconds = time.perf_counter() - start
+
+        predictions = LinearSVC().fit(X_train, train_labels).predict(X_test)
+        results.append({
+            'feature_mode': feature_mode,
+            'n_features': X_train.shape[1],
+            'vocabulary_size': len(getattr(count_vect, 'vocabulary_', {})),
+            'fit_seconds': fit_seconds,
+            'transform_seconds': transform_seconds,
+            'fit_peak_mb': fit_peak_mb(feature_mode, train_texts),
+            'train_matrix_mb': sparse_nbytes(X_train) / 1024 ** 2,
+            'accuracy': accuracy_score(test_labels, predictions),
+            'f1_weighted': f1_score(test_labels, predictions, average='weighted')
+        })
+    return results
+
+
+if __name__ == '__main__':
+    from Dataset_store import load_dataset
+    from Data_splits import CANONICAL_SPLIT, load_split
+
+    # python Feature_hashing.py [path of the dataset store]
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
+    df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'category_encoded'])
+    ticket_data = df_clean['complaint_what_happened_without_stopwords']
+    label_data = df_clean['category_encoded']
+
+    split = load_split(CANONICAL_SPLIT, label_data)
+    for result in benchmark_feature_modes(ticket_data.iloc[split['train']], label_data.iloc[split['train']],
+                                          ticket_data.iloc[split['test']], label_data.iloc[split['test']]):
+        print(f"{result['feature_mode']:<10} features {result['n_features']:>8}  fit {result['fit_seconds']:7.2f}s  "
+              f"transform {result['transform_seconds']:6.2f}s  fit peak (1 job) {result['fit_peak_mb']:8.1f} MB  "
+              f"matrix {result['train_matrix_mb']:7.1f} MB  accuracy {result['accuracy']:.4f}  "
+              f"f1 {result['f1_weighted']:.4f}")
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from Search_common import fit_and_score_rows, load_csr, rank_candidates, save_csr, take_rows
+
+
+# Directory of the materialized cross-validation folds
+FOLD_DIR = "/home/users/elicina/Master-Thesis/Dataset/Folds"
+
+
+def _manifest_path(fold_dir):
+    return os.path.join(fold_dir, 'manifest.json')
+
+
+# Vectorize and rebalance every fold of the training data once and store it as memory-mapped CSR arrays.
+# create_features() returns the unfitted feature steps (e.g. count + tf), fitted on the training rows of each fold
+# only; None uses the rows of an already vectorized matrix as they are. The rebalancer (SparseRebalancer) is
+# applied to the training rows of each fold, like the 'smote' step of the pipeline. The folds are reused while the
+# data, the feature steps, the rebalancer and the splitter are the same, the manifest records them.
+# Returns the fold directory for load_fold.
+def materialize_folds(X, y, fold_dir=FOLD_DIR, create_features=None, rebalancer=None, cv=None):
+    cv = cv if cv is not None else StratifiedKFold(n_splits=5)
+    labels = np.asarray(y)
+    features = create_features() if create_features is not None else None
+    entry = {
+        'key': joblib.hash((X, labels, features, rebalancer, cv)),
+        'features': repr(features),
+        'rebalancer': repr(rebalancer),
+        'cv': repr(cv),
+        'n_rows': len(labels)
+    }
+    if os.path.exists(_manifest_path(fold_dir)):
+        with open(_manifest_path(fold_dir)) as f:
+            manifest = json.load(f)
+        if {key: manifest.get(key) for key in entry} == entry:
+            return fold_dir
+
+    start = time.perf_counter()
+    folds = []
+    for fold, (train_pos, val_pos) in enumerate(cv.split(np.zeros(len(labels)), labels)):
+        X_train, X_val = take_rows(X, train_pos), take_rows(X, val_pos)
+        if create_features is not None:
+            steps = create_features()
+            X_train = steps.fit_transform(X_train, labels[train_pos])
+            X_val = steps.transform(X_val)
+        y_train = labels[train_pos]
+        if rebalancer is not None:
+            X_train, y_train = clone(rebalancer).fit_resample(X_train, y_train)
+
+        fold_path = os.path.join(fold_dir, f'fold_{fold}')
+        save_csr(X_train, os.path.join(fold_path, 'X_train'))
+        save_csr(X_val, os.path.join(fold_path, 'X_val'))
+        np.save(os.path.join(fold_path, 'y_train.npy'), np.asarray(y_train))
+        np.save(os.path.join(fold_path, 'y_val.npy'), labels[val_pos])
+        np.save(os.path.join(fold_path, 'val_pos.npy'), val_pos)
+        folds.append({'fold': fold, 'train_rows': int(X_train.shape[0]), 'val_rows': int(X_val.shape[0]),
+                      'n_features': int(X_train.shape[1])})
+
+    # The manifest is written last, an interrupted run is materialized again
+    entry.update(n_splits=len(folds), folds=folds, seconds=time.perf_counter() - start)
+    tmp_path = f'{_manifest_path(fold_dir)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, _manifest_path(fold_dir))
+    return fold_dir
+
+
+def n_folds(fold_dir):
+    with open(_manifest_path(fold_dir)) as f:
+        return json.load(f)['n_splits']
+
+
+# The fold as (X_train, y_train, X_val, y_val), the matrices are mapped read-only.
+# String labels are stored as object arrays, the files are written by materialize_folds only.
+def load_fold(fold_dir, fold):
+    fold_path = os.path.join(fold_dir, f'fold_{fold}')
+    return (load_csr(os.path.join(fold_path, 'X_train')), np.load(os.path.join(fold_path, 'y_train.npy'), allow_pickle=True),
+            load_csr(os.path.join(fold_path, 'X_val')), np.load(os.path.join(fold_path, 'y_val.npy'), allow_pickle=True))
+
+
+# Score and fit time of the candidate on the fold
+def _fit_and_score(estimator, params, fold_dir, fold, scoring, error_score=np.nan):
+    X_train, y_train, X_val, y_val = load_fold(fold_dir, fold)
+    score, fit_seconds, _, _ = fit_and_score_rows(clone(estimator).set_params(**params), X_train, y_train, X_val,
+                                                  y_val, scoring, error_score)
+    return score, fit_seconds
+
+
+# Grid search over materialized folds, used like GridSearchCV. The steps of the pipeline before the classifier
+# (feature steps and the rebalancer) are fitted once per fold by materialize_folds, the candidates only fit the
+# classifier on the mapped fold matrices. Another classifier with the same feature steps reuses the same folds.
+# The grid may only tune the classifier (the 'clf__' parameters), a plain estimator is searched on X as it is.
+# best_estimator_ is the whole pipeline with the best parameters refitted on all rows.
+class FoldSearchCV:
+    def __init__(self, estimator, param_grid, fold_dir=FOLD_DIR, cv=5, scoring=None, n_jobs=-1, verbose=0,
+                 error_score=np.nan):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.fold_dir = fold_dir
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.error_score = error_score
+
+    # The feature steps, the rebalancer and the classifier of the estimator
+    def _split_estimator(self):
+        if not hasattr(self.estimator, 'steps'):
+            return None, None, self.estimator
+        *prefix, (name, classifier) = self.estimator.steps
+        tuned = {key.split('__', 1)[0] for grid in ParameterGrid(self.param_grid).param_grid for key in grid}
+        if tuned - {name}:
+            raise ValueError(f"The fold search only tunes the '{name}' step, the grid also sets {sorted(tuned - {name})}")
+        features = [(step_name, step) for step_name, step in prefix if not hasattr(step, 'fit_resample')]
+        samplers = [step for _, step in prefix if hasattr(step, 'fit_resample')]
+        create_features = (lambda: Pipeline([(step_name, clone(step)) for step_name, step in features])) if features else None
+        return create_features, samplers[0] if samplers else None, Pipeline([(name, classifier)])
+
+    def fit(self, X, y):
+        create_features, rebalancer, classifier = self._split_estimator()
+        cv = StratifiedKFold(n_splits=self.cv) if isinstance(self.cv, int) else self.cv
+        materialize_folds(X, y, self.fold_dir, create_features, rebalancer, cv)
+
+        candidates = list(ParameterGrid(self.param_grid))
+        splits = n_folds(self.fold_dir)
+        results = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(_fit_and_score)(classifier, params, self.fold_dir, fold, self.scoring, self.error_score)
+            for params in candidates for fold in range(splits))
+        scores = np.array([score for score, _ in results]).reshape(len(candidates), splits)
+        fit_seconds = np.array([seconds for _, seconds in results]).reshape(len(candidates), splits)
+
+        self.cv_results_, self.best_index_ = rank_candidates(candidates, scores, fit_seconds)
+        self.n_splits_ = splits
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
@@ -2,20 +2,25 @@
 from matplotlib import pyplot as plt
 import numpy as np
 import torch
-import pandas as pd
 from transformers import BertTokenizer, BertForSequenceClassification
 from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score
-from sklearn.model_selection import train_test_split
 import time
+import os
+import sys
+
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
 
 
 print("Bert Model")
 
 # Preprocess the data
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df = load_dataset(file_path, columns=['complaint_what_happened_basic_clean_LMM', 'category_encoded'])
 
 # Initialize the tokenizer
 tokenizer = BertTokenizer.from_pretrained('bert-base-uncased', do_lower_case=True)
@@ -24,8 +29,9 @@ ticket_data = df['complaint_what_happened_basic_clean_LMM']
 label_data = df['category_encoded']
 
 # Split the dataset into training, validation, and testing sets
-t_texts, test_texts, t_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.3, random_state=42, shuffle=True)
-train_texts, val_texts, train_labels, val_labels = train_test_split(t_texts, t_labels, test_size=0.1, random_state=42, shuffle=True)
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, val_texts, test_texts = ticket_data.iloc[split['fit']], ticket_data.iloc[split['val']], ticket_data.iloc[split['test']]
+train_labels, val_labels, test_labels = label_data.iloc[split['fit']], label_data.iloc[split['val']], label_data.iloc[split['test']]
 
 # Encode the data
 train_encoded = tokenizer.batch_encode_plus(
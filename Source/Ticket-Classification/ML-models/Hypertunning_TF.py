@@ -9,25 +9,34 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, f1_score, classification_report
 import pandas as pd
-from sklearn.model_selection import GridSearchCV, train_test_split
 import nltk
 import seaborn as sns
 from sklearn.base import BaseEstimator, TransformerMixin
 from imblearn.pipeline import Pipeline as ImbPipeline
-from imblearn.over_sampling import SMOTE
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.feature_extraction.text import TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
+import sys
+
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+from Feature_hashing import create_vectorizer
+from Sparse_rebalancing import SparseRebalancer
+from Pipeline_cache import StatsMemory, print_cache_stats
+from Model_search import create_search, run_search, print_search_report
+from Fold_store import FOLD_DIR
 
 print("Hypertunning with TF-idf without Stopwords")
 
 
 nltk.download('punkt')
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'category_encoded', 'category', 'product', 'complaint_what_happened'])
 
 # Extract the relevant columns
 ticket_data = df_clean['complaint_what_happened_without_stopwords']
@@ -39,10 +48,10 @@ real_category_data = df_clean['category']
 subcategory_data = df_clean['product']
 complaint = df_clean['complaint_what_happened']
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels= train_test_split(
-    ticket_data, label_data, test_size=0.3, random_state=42, shuffle=True
-)
+# Load the shared training and testing split, computed once and persisted as index arrays
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
 
 # Print the sample sizes
 print(f"Number of samples in the training set: {len(train_texts)}")
@@ -110,16 +119,32 @@ parameters = {
 }
 
 
+# Feature mode of the 'count' step: 'vocabulary' (CountVectorizer) or 'hashing' (feature hashing, no vocabulary)
+feature_mode = 'vocabulary'
+
+# Cap of the rebalanced class sizes in every fold, bounds the synthetic rows (None: plain SMOTE to the majority class)
+max_samples_per_class = 5000
+
+# 'grid' fits every candidate on all training rows, 'halving' (successive halving) starts all candidates on a few rows
+# and only fits the best third of them on three times more rows in every round, 'folds' vectorizes and rebalances
+# the 5 folds once into fold_dir and all classifiers only fit on them
+search_mode = 'grid'
+fold_dir = os.path.join(FOLD_DIR, CANONICAL_SPLIT)
+
+# Cache of the fitted count, tf and smote steps, shared by all classifier candidates of a fold
+pipeline_cache_dir = "/home/users/elicina/Master-Thesis/Models/Pipeline-Cache"
+pipeline_memory = StatsMemory(pipeline_cache_dir)
+
 # Define the base pipeline
 def create_base_pipeline(classifier):
     return ImbPipeline([
-        ('count', CountVectorizer()),
+        ('count', create_vectorizer(feature_mode)),
         ('tf', TfidfTransformer()),
         # ('shape_printer_before', ShapePrinterBefore()),
-        ('smote', SMOTE(random_state=42)),
+        ('smote', SparseRebalancer(max_samples_per_class=max_samples_per_class, random_state=42)),
         # ('shape_printer_after', ShapePrinterAfter()),
         ('clf', classifier)
-    ])
+    ], memory=pipeline_memory)
 
 
 # Initialize variables to store the best model and its score
@@ -139,12 +164,15 @@ for clf_name, clf in classifiers.items():
     base_pipeline = create_base_pipeline(clf)
     
 
+    pipeline_memory.reset_stats()
     start_train_time = time.time()
 
-    # Perform grid search
-    gs_clf = GridSearchCV(base_pipeline, parameters[clf_name], n_jobs=-1, cv=5) # scoring=custom_scorer
-    gs_clf.fit(train_texts, train_labels)
+    # Perform the hyperparameter search
+    gs_clf = create_search(base_pipeline, parameters[clf_name], search_mode, cv=5, n_jobs=-1, fold_dir=fold_dir) # scoring=custom_scorer
+    search_report = run_search(gs_clf, train_texts, train_labels)
     end_train_time = time.time()
+    print_cache_stats(pipeline_memory.stats())
+    print_search_report(search_report)
 
     
     # Output the best score and parameters
@@ -156,7 +184,7 @@ for clf_name, clf in classifiers.items():
     print(f'Training Time for {clf_name}: {end_train_time - start_train_time:.2f} seconds')
 
 
-    # Retrieve the best model from RandomizedSearchCV
+    # Retrieve the best model from the search
     best_model = gs_clf.best_estimator_
 
     if best_score > best_overall_score:
@@ -232,6 +260,8 @@ for clf_name, clf in classifiers.items():
         'Precision': precision,
         'Recall': recall,
         'F1 Score': f1,
+        'Search Mode': search_mode,
+        'Fits': search_report['fits'],
         'Training Time (s)': end_train_time - start_train_time,
         'Test Evaluation Time (s)': end_test_time - start_test_time
     })
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 from matplotlib import pyplot as plt
 from sklearn.linear_model import LogisticRegression
@@ -8,7 +10,7 @@ from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, r
 import pandas as pd
 import seaborn as sns
 import numpy as np
-from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.model_selection import GridSearchCV
 from gensim.models import Word2Vec
 from nltk.tokenize import sent_tokenize, word_tokenize
 import nltk
@@ -16,57 +18,102 @@ from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.utils.validation import check_is_fitted
 from imblearn.pipeline import Pipeline as ImbPipeline
 from imblearn.over_sampling import SMOTE
+import sys
+
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+from W2V_embedding import DocumentEmbedder
+from W2V_store import W2V_DIR, texts_fingerprint, train_or_find_keyed_vectors, load_keyed_vectors, \
+    load_or_compute_embeddings, cache_summary
 
 
 print("Hypertunning with W2V and Greadsearch")
 
 nltk.download('punkt')
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_basic_clean_DL', 'category_encoded'])
 
 # Extract the relevant columns
 ticket_data = df_clean['complaint_what_happened_basic_clean_DL']
 
 label_data = df_clean['category_encoded']
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.3, random_state=42, shuffle=True)
+# Load the shared training and testing split, computed once and persisted as index arrays
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
+
 
+# Directory of the vectors trained by the Word2VecTransformer, one file per parameter set and training rows
+# (i.e. per cross-validation fold), and of the document embeddings computed with them
+w2v_cache_dir = os.path.join(W2V_DIR, 'grid_search')
 
-# Define the Word2Vec transformer
+# Define the Word2Vec transformer.
+# With a cache_dir the trained vectors are persisted and loaded memory-mapped read-only: a refit on the same rows
+# with the same parameters skips the training, and pickled copies (e.g. sent to the grid-search workers) only
+# carry the path, every process maps the same embedding matrix. The document embeddings are cached as well, so
+# the grid search trains Word2Vec once per Word2Vec setting and fold instead of once per candidate and fold.
 class Word2VecTransformer(BaseEstimator, TransformerMixin):
-    def __init__(self, vector_size=100, window=5, min_count=2, workers=4, sg=1):
+    def __init__(self, vector_size=100, window=5, min_count=2, workers=4, sg=1, cache_dir=None):
         self.vector_size = vector_size
         self.window = window
         self.min_count = min_count
         self.workers = workers
         self.sg = sg
+        self.cache_dir = cache_dir
 
-    def fit(self, X, y=None):
+    def _w2v_params(self):
+        return {'vector_size': self.vector_size, 'window': self.window, 'min_count': self.min_count, 'sg': self.sg}
+
+    def _train(self, X):
         data = []
         for text in X:
             for sentence in sent_tokenize(text):
                 words = [word.lower() for word in word_tokenize(sentence)]
                 data.append(words)
-        self.model = Word2Vec(sentences=data, vector_size=self.vector_size, window=self.window, min_count=self.min_count, workers=self.workers, sg = self.sg)
+        return Word2Vec(sentences=data, workers=self.workers, **self._w2v_params())
+
+    def fit(self, X, y=None):
+        texts = list(X)
+        if self.cache_dir is None:
+            self.wv_ = self._train(texts).wv
+            self.wv_path_ = None
+            return self
+        key = json.dumps([self._w2v_params(), texts_fingerprint(texts)], sort_keys=True)
+        name = 'w2v_' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        # The file is named after the hash of the vectors, so are the cached embeddings of transform
+        self.wv_path_ = train_or_find_keyed_vectors(name, texts, self._train, self._w2v_params(), self.cache_dir)
+        self.wv_ = load_keyed_vectors(self.wv_path_)
         return self
 
     def transform(self, X, y=None):
-        check_is_fitted(self, 'model')
-        embeddings = []
-        for text in X:
-            tokens = text.split()
-            vectors = [self.model.wv[token] for token in tokens if token in self.model.wv]
-            if vectors:
-                vector = np.mean(vectors, axis=0)
-            else:
-                vector = np.zeros(self.vector_size)
-            embeddings.append(vector)
-        return np.array(embeddings)
+        check_is_fitted(self, 'wv_')
+        texts = list(X)
+        # Mean of the token vectors of every text, one sparse x embedding matrix product for the whole batch
+        if not self.wv_path_:
+            return DocumentEmbedder(self.wv_).transform(texts)
+        # The embeddings of the fold's training and validation rows are cached next to the vectors,
+        # the candidates only differing in classifier parameters reuse them
+        path = f'{os.path.splitext(self.wv_path_)[0]}_{texts_fingerprint(texts)[:16]}.npy'
+        return load_or_compute_embeddings(path, lambda: DocumentEmbedder(self.wv_).transform(texts))
+
+    # Persisted vectors are not pickled, they are mapped again from their file
+    def __getstate__(self):
+        state = dict(super().__getstate__())
+        if state.get('wv_path_'):
+            state.pop('wv_', None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if getattr(self, 'wv_path_', None) and not hasattr(self, 'wv_'):
+            self.wv_ = load_keyed_vectors(self.wv_path_)
 
 # Define a custom transformer to print the shape
 class ShapePrinter(BaseEstimator, TransformerMixin):
@@ -87,7 +134,7 @@ classifiers = {
 # Define the base pipeline
 def create_base_pipeline(classifier):
     return ImbPipeline([
-        ('w2v', Word2VecTransformer()),
+        ('w2v', Word2VecTransformer(cache_dir=w2v_cache_dir)),
         ('smote', SMOTE(random_state=42)),
         # ('shape_printer', ShapePrinter()),
         ('clf', classifier)
@@ -134,6 +181,10 @@ for clf_name, clf in classifiers.items():
     print(f'Best score: {best_score}')
     print(f'Best parameters: {best_params}')
 
+    # Word2Vec models and document embeddings computed so far, the classifier-only candidates reused them
+    w2v_cache = cache_summary(w2v_cache_dir)
+    print(f"Word2Vec cache: {w2v_cache['vectors']} trained models, {w2v_cache['embeddings']} embedding sets, {w2v_cache['mb']:.1f} MB")
+
     # Retrieve the best model from RandomizedSearchCV
     best_model = gs_clf.best_estimator_
 
@@ -9,24 +9,33 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, f1_score, classification_report
 import pandas as pd
-from sklearn.model_selection import GridSearchCV, train_test_split
 import nltk
 import seaborn as sns
 from sklearn.base import BaseEstimator, TransformerMixin
 from imblearn.pipeline import Pipeline as ImbPipeline
-from imblearn.over_sampling import SMOTE
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.feature_extraction.text import TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
+import sys
+
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+from Feature_hashing import create_vectorizer
+from Sparse_rebalancing import SparseRebalancer
+from Pipeline_cache import StatsMemory, print_cache_stats
+from Model_search import create_search, run_search, print_search_report
+from Work_queue import close_queue
 
 print("Hypertunning with TF-idf without Stopwords")
 
 nltk.download('punkt')
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'category_encoded', 'category', 'product', 'complaint_what_happened'])
 
 # Extract the relevant columns
 ticket_data = df_clean['complaint_what_happened_without_stopwords']
@@ -35,10 +44,13 @@ real_category_data = df_clean['category']
 subcategory_data = df_clean['product']
 complaint = df_clean['complaint_what_happened']
 
-# Split the data into training and testing sets, keeping the original raw text
-train_texts, test_texts, train_labels, test_labels, train_raw, test_raw, train_cat, test_cat, train_sub, test_sub = train_test_split(
-    ticket_data, label_data, complaint,real_category_data, subcategory_data, test_size=0.3, random_state=42, shuffle=True
-)
+# Load the shared training and testing split, keeping the original raw text
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
+train_raw, test_raw = complaint.iloc[split['train']], complaint.iloc[split['test']]
+train_cat, test_cat = real_category_data.iloc[split['train']], real_category_data.iloc[split['test']]
+train_sub, test_sub = subcategory_data.iloc[split['train']], subcategory_data.iloc[split['test']]
 
 # Print the sample sizes
 print(f"Number of samples in the training set: {len(train_texts)}")
@@ -79,14 +91,34 @@ parameters = {
     }
 }
 
+# Feature mode of the 'count' step: 'vocabulary' (CountVectorizer) or 'hashing' (feature hashing, no vocabulary)
+feature_mode = 'vocabulary'
+
+# Cap of the rebalanced class sizes in every fold, bounds the synthetic rows (None: plain SMOTE to the majority class)
+max_samples_per_class = 5000
+
+# The SLURM job of launch.sh ends after 180 minutes: 'checkpointed' writes every finished fit to checkpoint_dir and
+# the requeued job resumes the search where it stopped
+search_mode = os.environ.get('SEARCH_MODE', 'checkpointed')
+checkpoint_dir = "/home/users/elicina/Master-Thesis/Models/Search-Checkpoints/Test"
+
+# launch_queue.sh runs the search with SEARCH_MODE=queue: the fits are shared out to the workers of all nodes through
+# queue_dir, queue_workers=None waits for those workers (a number starts local worker processes instead)
+queue_dir = os.environ.get('QUEUE_DIR', "/home/users/elicina/Master-Thesis/Models/Search-Queue")
+queue_workers = None
+
+# Cache of the fitted count, tf and smote steps, shared by all classifier candidates of a fold
+pipeline_cache_dir = "/home/users/elicina/Master-Thesis/Models/Pipeline-Cache"
+pipeline_memory = StatsMemory(pipeline_cache_dir)
+
 # Define the base pipeline
 def create_base_pipeline(classifier):
     return ImbPipeline([
-        ('count', CountVectorizer()),
+        ('count', create_vectorizer(feature_mode)),
         ('tf', TfidfTransformer()),
-        ('smote', SMOTE(random_state=42)),
+        ('smote', SparseRebalancer(max_samples_per_class=max_samples_per_class, random_state=42)),
         ('clf', classifier)
-    ])
+    ], memory=pipeline_memory)
 
 # Initialize variables to store the best model and its score
 best_overall_model = None
@@ -102,12 +134,16 @@ for clf_name, clf in classifiers.items():
     # Create the base pipeline for the classifier
     base_pipeline = create_base_pipeline(clf)
     
+    pipeline_memory.reset_stats()
     start_train_time = time.time()
 
-    # Perform grid search
-    gs_clf = GridSearchCV(base_pipeline, parameters[clf_name], n_jobs=-1, cv=5)
-    gs_clf.fit(train_texts, train_labels)
+    # Perform the hyperparameter search
+    gs_clf = create_search(base_pipeline, parameters[clf_name], search_mode, cv=5, n_jobs=-1,
+                           checkpoint_dir=checkpoint_dir, queue_dir=queue_dir, queue_workers=queue_workers)
+    search_report = run_search(gs_clf, train_texts, train_labels)
     end_train_time = time.time()
+    print_cache_stats(pipeline_memory.stats())
+    print_search_report(search_report)
     
     # Output the best score and parameters
     best_score = gs_clf.best_score_
@@ -206,3 +242,8 @@ for clf_name, clf in classifiers.items():
     unique_classes = test_labels.unique()  # type: ignore # Get unique class labels from the test set
     confusion_matrix_filename = os.path.join("/home/users/elicina/Master-Thesis/",f"{clf_name}.png")
     plot_confusion_matrix(test_labels, test_predictions, unique_classes, confusion_matrix_filename)
+
+
+# No more searches for the workers of launch_queue.sh, they stop once the queue is empty
+if search_mode == 'queue':
+    close_queue(queue_dir)
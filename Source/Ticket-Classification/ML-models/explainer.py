@@ -1,15 +1,22 @@
+import os
+import sys
 import joblib
 import shap
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 import matplotlib.pyplot as plt
 
+# The text normalizer lives next to the preprocessing code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Topic-Moddeling'))
+from Text_normalizer import TextNormalizer
+
 
 # Load the model and required objects with error handling
 try:
     loaded_model = joblib.load('/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/modelML.pkl')
     tfidf_vectorizer = joblib.load('/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/tfidf_transformer.pkl')
     explainer = joblib.load('/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/explainer.pkl')
+    normalizer = TextNormalizer.load_or_default('/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/normalizer.pkl')
 except Exception as e:
     print(f"Error loading model or objects: {e}")
     raise
@@ -23,14 +30,14 @@ def predict_lr(text):
         3: 'Loans',
         4: 'Money Transfers and Financial Services'
     }
-    X_new_tfidf = tfidf_vectorizer.transform(text)
+    X_new_tfidf = tfidf_vectorizer.transform(normalizer.transform(text))
     predicted = loaded_model.predict(X_new_tfidf)
     predicted_proba = loaded_model.predict_proba(X_new_tfidf)
     return Topic_names[predicted[0]], predicted[0], predicted_proba
 
 # Function to explain predictions using KernelExplainer
 def explain_texts(texts):
-     X_tfidf = tfidf_vectorizer.transform(texts)
+     X_tfidf = tfidf_vectorizer.transform(normalizer.transform(texts))
      shap_values = explainer.shap_values(X_tfidf)
      return shap_values
 
@@ -1,3 +1,5 @@
+import os
+import sys
 import joblib
 import numpy as np
 import shap
@@ -6,7 +8,7 @@ from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, f1_score, classification_report
 import pandas as pd
-from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.model_selection import GridSearchCV
 import nltk
 import seaborn as sns
 from sklearn.base import BaseEstimator, TransformerMixin
@@ -14,17 +16,26 @@ from imblearn.pipeline import Pipeline as ImbPipeline
 from imblearn.over_sampling import SMOTE
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+
+# The text normalizer lives next to the preprocessing code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Topic-Moddeling'))
+from Text_normalizer import TextNormalizer
+
 
 print("Hypertunning with TF-idf without Stopwords")
 
 
 nltk.download('punkt')
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'category_encoded'])
 
 # Extract the relevant columns
 ticket_data = df_clean['complaint_what_happened_without_stopwords']
@@ -32,8 +43,14 @@ ticket_data = df_clean['complaint_what_happened_without_stopwords']
 
 label_data = df_clean['category_encoded']
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.3, random_state=42, shuffle=True)
+# Clean the tickets with the same normalizer that is saved next to the model for the online classification
+normalizer = TextNormalizer()
+ticket_data = normalizer.transform(ticket_data)
+
+# Load the shared training and testing split, computed once and persisted as index arrays
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
 
 # Print the sample sizes
 print(f"Number of samples in the training set: {len(train_texts)}")
@@ -185,4 +202,5 @@ for clf_name, clf in classifiers.items():
 joblib.dump(best_overall_model.named_steps['clf'], '/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/modelML.pkl')
 joblib.dump(best_tfidf_transformer, '/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/tfidf_transformer.pkl')
 joblib.dump(explainer, '/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/explainer.pkl')
+normalizer.save('/home/users/elicina/Master-Thesis/Models/MLmodel/Shap/normalizer.pkl')
 
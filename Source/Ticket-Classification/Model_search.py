@@ -0,0 +1,101 @@
+import tempfile
+import time
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401, enables HalvingGridSearchCV
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, ParameterGrid, check_cv
+from Fold_store import FOLD_DIR, FoldSearchCV
+from Checkpointed_search import CHECKPOINT_DIR, CheckpointedSearchCV
+from Work_queue import QUEUE_DIR, QueueSearchCV
+
+
+# Search modes of the hyperparameter searches:
+# 'grid' fits every candidate on every fold with all training rows,
+# 'halving' (successive halving) fits all candidates on a small number of rows, then only the best 1/factor of them
+# on factor times more rows, until the last candidates are fitted on all rows,
+# 'folds' fits the steps before the classifier once per fold and stores the folds in fold_dir, every candidate
+# only fits the classifier on them (Fold_store.py),
+# 'checkpointed' fits like 'grid' and appends every finished fit to a checkpoint in checkpoint_dir, a restarted
+# search only runs the missing fits (Checkpointed_search.py),
+# 'queue' puts the fits into a file queue in queue_dir, fitted by queue_workers local processes or, with None, by the
+# workers of the SLURM nodes (Work_queue.py).
+SEARCH_MODES = ('grid', 'halving', 'folds', 'checkpointed', 'queue')
+
+
+# The search object of the mode, all of them expose best_estimator_, best_params_, best_score_ and cv_results_
+def create_search(estimator, param_grid, search_mode='grid', cv=5, scoring=None, n_jobs=-1, verbose=0, factor=3,
+                  min_resources='exhaust', random_state=42, fold_dir=FOLD_DIR,
+                  checkpoint_dir=CHECKPOINT_DIR, queue_dir=QUEUE_DIR, queue_workers=None):
+    if search_mode == 'grid':
+        return GridSearchCV(estimator, param_grid, cv=cv, scoring=scoring, n_jobs=n_jobs, verbose=verbose)
+    if search_mode == 'halving':
+        return HalvingGridSearchCV(estimator, param_grid, cv=cv, scoring=scoring, n_jobs=n_jobs, verbose=verbose,
+                                   factor=factor, resource='n_samples', min_resources=min_resources,
+                                   random_state=random_state)
+    if search_mode == 'folds':
+        return FoldSearchCV(estimator, param_grid, fold_dir=fold_dir, cv=cv, scoring=scoring, n_jobs=n_jobs,
+                            verbose=verbose)
+    if search_mode == 'checkpointed':
+        return CheckpointedSearchCV(estimator, param_grid, checkpoint_dir=checkpoint_dir, cv=cv, scoring=scoring,
+                                    n_jobs=n_jobs, verbose=verbose)
+    if search_mode == 'queue':
+        return QueueSearchCV(estimator, param_grid, queue_dir=queue_dir, cv=cv, scoring=scoring, n_workers=queue_workers)
+    raise ValueError(f"Unknown search mode '{search_mode}', available modes: {SEARCH_MODES}")
+
+
+# Fit the search and return its report: the fits done and the rows they were trained on,
+# next to what the exhaustive grid search needs on the same data
+def run_search(search, X, y):
+    start = time.perf_counter()
+    search.fit(X, y)
+    wall_seconds = time.perf_counter() - start
+
+    n_splits = check_cv(search.cv, y, classifier=True).get_n_splits(X, y)
+    n_train_rows = len(y) * (n_splits - 1) // n_splits
+    grid_fits = len(ParameterGrid(search.param_grid)) * n_splits
+
+    if isinstance(search, HalvingGridSearchCV):
+        fits = sum(search.n_candidates_) * n_splits
+        # n_resources_ counts the rows of the whole search data, every fold trains on (n_splits - 1) / n_splits of them
+        fitted_rows = sum(candidates * n_splits * (resources * (n_splits - 1) // n_splits)
+                          for candidates, resources in zip(search.n_candidates_, search.n_resources_))
+    else:
+        fits = grid_fits
+        fitted_rows = grid_fits * n_train_rows
+
+    return {
+        'search_mode': {HalvingGridSearchCV: 'halving', FoldSearchCV: 'folds',
+                        CheckpointedSearchCV: 'checkpointed', QueueSearchCV: 'queue'}.get(type(search), 'grid'),
+        'candidates': len(ParameterGrid(search.param_grid)),
+        'fits': fits,
+        'grid_fits': grid_fits,
+        'fitted_rows': fitted_rows,
+        'grid_fitted_rows': grid_fits * n_train_rows,
+        'wall_seconds': wall_seconds,
+        'best_score': search.best_score_,
+        'best_params': search.best_params_
+    }
+
+
+def print_search_report(report):
+    print(f"{report['search_mode']} search: {report['fits']} fits ({report['grid_fits']} with the grid search), "
+          f"{report['fitted_rows']} fitted rows ({report['fitted_rows'] / report['grid_fitted_rows']:.1%} of the grid "
+          f"search), {report['wall_seconds']:.1f} seconds")
+
+
+# Run the searches of the local modes on the same data and compare their wall time and result with the grid search.
+# The 'queue' mode needs running workers and is left out. The 'checkpointed' search writes to a new temporary
+# checkpoint directory, a checkpoint of an earlier run would make it only read the finished fits.
+def compare_search_modes(estimator, param_grid, X, y, **search_params):
+    reports = []
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        for search_mode in SEARCH_MODES:
+            if search_mode == 'queue':
+                continue
+            params = dict(search_params, checkpoint_dir=checkpoint_dir) if search_mode == 'checkpointed' else search_params
+            reports.append(run_search(create_search(estimator, param_grid, search_mode, **params), X, y))
+    for report in reports:
+        print_search_report(report)
+        print(f"  best score {report['best_score']:.4f} with {report['best_params']}")
+    for report in reports[1:]:
+        print(f"The {report['search_mode']} search took {report['wall_seconds'] / reports[0]['wall_seconds']:.1%} "
+              f"of the grid search time")
+    return reports
@@ -0,0 +1,82 @@
+import json
+import os
+import time
+from collections import defaultdict
+import joblib
+
+
+# Step cache of the ImbPipeline grid searches, passed as the memory of the pipeline.
+# The pipeline caches the fit of every step before the classifier (count, tf, smote) with joblib, keyed by the step
+# with its parameters and by the rows it is fitted on: within a fold all classifier candidates share the fitted
+# prefix, only a new fold or other upstream parameters fit it again. Every cached call is recorded as a hit or a miss
+# in cache_stats.jsonl, the grid-search workers append to the same file from their processes.
+class StatsMemory:
+    def __init__(self, location, verbose=0):
+        self.location = location
+        self.verbose = verbose
+        os.makedirs(location, exist_ok=True)
+        self.memory = joblib.Memory(location, verbose=verbose)
+        self.stats_path = os.path.join(location, 'cache_stats.jsonl')
+
+    def cache(self, func):
+        return RecordedCall(self.memory.cache(func), self.stats_path)
+
+    # Start the statistics of a new search, the cached steps are kept
+    def reset_stats(self):
+        if os.path.exists(self.stats_path):
+            os.remove(self.stats_path)
+
+    def clear(self):
+        self.memory.clear(warn=False)
+        self.reset_stats()
+
+    # Hits, misses and the time the hits saved per step, the saved time is estimated with the mean time of the misses
+    def stats(self):
+        calls = defaultdict(lambda: {'hits': 0, 'misses': 0, 'hit_seconds': 0.0, 'miss_seconds': 0.0})
+        if os.path.exists(self.stats_path):
+            with open(self.stats_path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    step = calls[record['step']]
+                    if record['hit']:
+                        step['hits'] += 1
+                        step['hit_seconds'] += record['seconds']
+                    else:
+                        step['misses'] += 1
+                        step['miss_seconds'] += record['seconds']
+
+        stats = {}
+        for name, step in calls.items():
+            total = step['hits'] + step['misses']
+            mean_miss_seconds = step['miss_seconds'] / step['misses'] if step['misses'] else 0.0
+            stats[name] = dict(step, calls=total, hit_rate=step['hits'] / total,
+                               saved_seconds=step['hits'] * mean_miss_seconds - step['hit_seconds'])
+        return stats
+
+
+# A cached pipeline function that records whether each call was already in the cache and how long it took
+class RecordedCall:
+    def __init__(self, memorized_func, stats_path):
+        self.memorized_func = memorized_func
+        self.stats_path = stats_path
+
+    def __call__(self, estimator, *args, **kwargs):
+        hit = self.memorized_func.check_call_in_cache(estimator, *args, **kwargs)
+        start = time.perf_counter()
+        result = self.memorized_func(estimator, *args, **kwargs)
+        record = {'step': type(estimator).__name__, 'hit': hit, 'seconds': time.perf_counter() - start,
+                  'pid': os.getpid()}
+        # A single short append, the lines of concurrent workers do not interleave
+        with open(self.stats_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return result
+
+
+def print_cache_stats(stats):
+    if not stats:
+        print("Pipeline cache: no cached steps were fitted")
+        return
+    for name, step in stats.items():
+        print(f"Pipeline cache {name}: {step['hits']}/{step['calls']} hits ({step['hit_rate']:.0%}), "
+              f"{step['miss_seconds']:.1f}s fitting, {step['saved_seconds']:.1f}s saved")
+    print(f"Pipeline cache total: {sum(step['saved_seconds'] for step in stats.values()):.1f}s saved")
@@ -1,27 +1,27 @@
 from imblearn.over_sampling import SMOTE
 import pandas as pd
-import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.model_selection import train_test_split
-from gensim.models import Word2Vec
-from nltk.tokenize import sent_tokenize, word_tokenize
 import nltk
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
 nltk.download('punkt')
 
 # ---------------------------------------------------------------- Choose right columns ----------------------------------------------------
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'category_encoded'])
 
 # Keep the columns "complaint_what_happened" & "category_encoded" only in the new dataframe --> training_data
 ticket_data = df_clean['complaint_what_happened_without_stopwords']
 label_data = df_clean['category_encoded']
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.2, random_state=42, shuffle=True)
+# Load the shared training and testing split, computed once and persisted as index arrays
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
 
 
 
@@ -43,7 +43,6 @@ X_train_tf, count_vect, tfidf_transformer = Tfidf_method(train_texts)
 X_test_tf, _, _ = Tfidf_method(test_texts, count_vect, tfidf_transformer)
 
 import matplotlib.pyplot as plt
-import numpy as np
 from collections import Counter
 import seaborn as sns
 
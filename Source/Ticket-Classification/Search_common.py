@@ -0,0 +1,70 @@
+import os
+import time
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics import check_scoring
+
+
+# Helpers shared by the fold store, the checkpointed and queue searches and the topic-count sweep:
+# memory-mapped CSR matrices, rows by position, the score of one fit and the ranking of the candidates
+
+
+# Write the CSR arrays as .npy files in canonical format, the read-only mapped arrays need no sorting in place
+def save_csr(matrix, path):
+    os.makedirs(path, exist_ok=True)
+    matrix = sp.csr_matrix(matrix)
+    matrix.sum_duplicates()
+    for name in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(path, f'{name}.npy'), getattr(matrix, name))
+    np.save(os.path.join(path, 'shape.npy'), np.array(matrix.shape))
+
+
+# The matrix of save_csr, its arrays are mapped read-only: all processes loading it share one physical copy
+def load_csr(path, mmap_mode='r'):
+    arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ('data', 'indices', 'indptr')]
+    matrix = sp.csr_matrix(tuple(arrays), shape=tuple(np.load(os.path.join(path, 'shape.npy'))), copy=False)
+    matrix.has_canonical_format = True
+    return matrix
+
+
+# Rows of a DataFrame/Series by position, or of an array or sparse matrix
+def take_rows(X, positions):
+    return X.iloc[positions] if hasattr(X, 'iloc') else X[positions]
+
+
+# Fit the estimator and score it on the test rows, returns the score, the fit and score seconds and the error.
+# A candidate failing to fit or to score gets error_score like with GridSearchCV (error_score='raise' raises).
+def fit_and_score_rows(estimator, X_train, y_train, X_test, y_test, scoring, error_score=np.nan):
+    start = time.perf_counter()
+    fit_seconds = None
+    try:
+        estimator.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        score = check_scoring(estimator, scoring)(estimator, X_test, y_test)
+        return float(score), fit_seconds, time.perf_counter() - start, None
+    except Exception as error:
+        if error_score == 'raise':
+            raise
+        warnings.warn(f"{estimator!r} failed, its score is set to {error_score}: {error!r}")
+        if fit_seconds is None:
+            return float(error_score), time.perf_counter() - start, 0.0, repr(error)
+        return float(error_score), fit_seconds, time.perf_counter() - start, repr(error)
+
+
+# cv_results_ and the index of the best candidate from the scores and fit times of shape (candidates, folds).
+# Failed candidates (nan) rank last, ties share the rank and the first candidate wins, like GridSearchCV.
+def rank_candidates(candidates, scores, fit_seconds):
+    mean_scores = scores.mean(axis=1)
+    ranking_scores = np.where(np.isnan(mean_scores), -np.inf, mean_scores)
+    cv_results = {
+        'params': candidates,
+        'mean_test_score': mean_scores,
+        'std_test_score': scores.std(axis=1),
+        'rank_test_score': np.searchsorted(np.sort(-ranking_scores), -ranking_scores) + 1,
+        'mean_fit_time': fit_seconds.mean(axis=1)
+    }
+    for fold in range(scores.shape[1]):
+        cv_results[f'split{fold}_test_score'] = scores[:, fold]
+    return cv_results, int(np.argmax(ranking_scores))
@@ -0,0 +1,125 @@
+import numbers
+import numpy as np
+import scipy.sparse as sp
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+# Count one shard with its own vocabulary, returns the sorted terms of the shard and its count matrix
+def _count_shard(params, texts):
+    vectorizer = CountVectorizer(**params)
+    try:
+        counts = vectorizer.fit_transform(texts)
+    except ValueError:  # Shard without any term, e.g. only stop words
+        return np.array([], dtype=object), sp.csr_matrix((len(texts), 0), dtype=params['dtype'])
+    return vectorizer.get_feature_names_out(), counts
+
+
+def _transform_chunk(vectorizer, texts):
+    return CountVectorizer.transform(vectorizer, texts)
+
+
+# CountVectorizer fitting the corpus in shards counted in parallel processes. The shard vocabularies are merged
+# into one sorted vocabulary and the shard columns are remapped to it, the document frequencies of the merged matrix
+# give the min_df/max_df filtering. The matrix and vocabulary are identical to a serial CountVectorizer.
+class ShardedCountVectorizer(CountVectorizer):
+    def __init__(self, *, input='content', encoding='utf-8', decode_error='strict', strip_accents=None,
+                 lowercase=True, preprocessor=None, tokenizer=None, stop_words=None,
+                 token_pattern=r"(?u)\b\w\w+\b", ngram_range=(1, 1), analyzer='word', max_df=1.0, min_df=1,
+                 max_features=None, vocabulary=None, binary=False, dtype=np.int64, n_jobs=1, n_shards=None,
+                 chunk_size=10000):
+        super().__init__(input=input, encoding=encoding, decode_error=decode_error, strip_accents=strip_accents,
+                         lowercase=lowercase, preprocessor=preprocessor, tokenizer=tokenizer, stop_words=stop_words,
+                         token_pattern=token_pattern, ngram_range=ngram_range, analyzer=analyzer, max_df=max_df,
+                         min_df=min_df, max_features=max_features, vocabulary=vocabulary, binary=binary, dtype=dtype)
+        self.n_jobs = n_jobs
+        self.n_shards = n_shards
+        self.chunk_size = chunk_size
+
+    def _count_params(self):
+        params = self.get_params()
+        for name in ('n_jobs', 'n_shards', 'chunk_size'):
+            params.pop(name)
+        # The limits apply to the whole corpus, the shards keep every term
+        params.update(max_df=1.0, min_df=1, max_features=None)
+        return params
+
+    def fit(self, raw_documents, y=None):
+        self.fit_transform(raw_documents)
+        return self
+
+    def fit_transform(self, raw_documents, y=None):
+        texts = list(raw_documents)
+        n_jobs = effective_n_jobs(self.n_jobs)
+        # A fixed vocabulary or max_features need the serial implementation
+        if n_jobs == 1 or self.vocabulary is not None or self.max_features is not None or len(texts) < 2:
+            return super().fit_transform(texts)
+
+        n_shards = min(self.n_shards or n_jobs, len(texts))
+        bounds = np.linspace(0, len(texts), n_shards + 1).astype(int)
+        params = self._count_params()
+        shards = Parallel(n_jobs=n_jobs)(delayed(_count_shard)(params, texts[start:end])
+                                         for start, end in zip(bounds[:-1], bounds[1:]))
+
+        # Merged vocabulary, sorted like the one of CountVectorizer, and the shard columns mapped onto it
+        terms = np.unique(np.concatenate([shard_terms for shard_terms, _ in shards]))
+        if len(terms) == 0:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        parts = []
+        for shard_terms, counts in shards:
+            counts = counts.tocsr()
+            counts.indices = np.searchsorted(terms, shard_terms)[counts.indices].astype(counts.indices.dtype)
+            parts.append(sp.csr_matrix((counts.data, counts.indices, counts.indptr), shape=(counts.shape[0], len(terms))))
+        X = sp.vstack(parts, format='csr')
+        X.sort_indices()
+
+        # Document frequencies of the merged matrix for the min_df/max_df limits
+        n_docs = X.shape[0]
+        max_doc_count = self.max_df if isinstance(self.max_df, numbers.Integral) else self.max_df * n_docs
+        min_doc_count = self.min_df if isinstance(self.min_df, numbers.Integral) else self.min_df * n_docs
+        if max_doc_count < min_doc_count:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        document_frequency = np.bincount(X.indices, minlength=len(terms))
+        keep = (document_frequency <= max_doc_count) & (document_frequency >= min_doc_count)
+        if not keep.all():
+            if not keep.any():
+                raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+            # Drop the pruned columns directly on the CSR arrays, cheaper than column indexing on large vocabularies
+            new_columns = np.cumsum(keep) - 1
+            kept_entries = keep[X.indices]
+            # Kept entries per row, counted by the row of every entry (empty rows count 0)
+            entry_rows = np.repeat(np.arange(n_docs), np.diff(X.indptr))
+            row_lengths = np.bincount(entry_rows[kept_entries], minlength=n_docs)
+            indptr = np.concatenate([[0], np.cumsum(row_lengths)]).astype(X.indptr.dtype)
+            X = sp.csr_matrix((X.data[kept_entries], new_columns[X.indices[kept_entries]].astype(X.indices.dtype),
+                               indptr), shape=(n_docs, int(keep.sum())))
+            terms = terms[keep]
+
+        self.vocabulary_ = {term: index for index, term in enumerate(terms.tolist())}
+        self.fixed_vocabulary_ = False
+        return X
+
+    # Transform in chunks counted in parallel processes
+    def transform(self, raw_documents):
+        texts = list(raw_documents)
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs == 1 or len(texts) <= self.chunk_size:
+            return super().transform(texts)
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        return sp.vstack(Parallel(n_jobs=n_jobs)(delayed(_transform_chunk)(self, chunk) for chunk in chunks),
+                         format='csr')
+
+
+if __name__ == '__main__':
+    # Check the matrix and vocabulary against CountVectorizer, with pruning and with empty documents at the end
+    corpus = ['the card was charged twice', 'my card payment failed', 'loan payment was late', 'the the the', '',
+              'mortgage loan payment', 'card card loan', 'the', '']
+    settings = [{}, {'min_df': 2}, {'max_df': 0.5, 'stop_words': 'english'}, {'min_df': 2, 'ngram_range': (1, 2)}]
+    for params in settings:
+        expected = CountVectorizer(**params)
+        expected_counts = expected.fit_transform(corpus)
+        sharded = ShardedCountVectorizer(n_jobs=2, n_shards=3, **params)
+        counts = sharded.fit_transform(corpus)
+        assert sharded.vocabulary_ == expected.vocabulary_, params
+        assert (counts != expected_counts).nnz == 0 and counts.shape == expected_counts.shape, params
+    print(f"ShardedCountVectorizer is identical to CountVectorizer for {len(settings)} settings")
@@ -0,0 +1,93 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from imblearn.over_sampling import RandomOverSampler, SMOTE
+from imblearn.under_sampling import RandomUnderSampler
+from sklearn.base import BaseEstimator
+from Feature_hashing import sparse_nbytes
+
+
+# Class rebalancing for sparse TF-IDF features that keeps the CSR format end to end.
+# Every class is brought to the size of the largest class, capped at max_samples_per_class: the classes above
+# the cap are randomly undersampled, the classes below it get SMOTE samples. The cap bounds the number of
+# synthetic rows and with it their memory, None brings every class to the largest one like plain SMOTE.
+# A class with a single row in a fold has no neighbour for SMOTE, its row is duplicated instead.
+# Used like SMOTE, standalone or as the 'smote' step of an ImbPipeline.
+class SparseRebalancer(BaseEstimator):
+    def __init__(self, max_samples_per_class=5000, k_neighbors=5, random_state=None):
+        self.max_samples_per_class = max_samples_per_class
+        self.k_neighbors = k_neighbors
+        self.random_state = random_state
+
+    def fit_resample(self, X, y):
+        X = sp.csr_matrix(X)
+        labels = np.asarray(y)
+        counts = Counter(labels)
+        target = max(counts.values())
+        if self.max_samples_per_class is not None:
+            target = min(target, self.max_samples_per_class)
+
+        above = {label: target for label, count in sorted(counts.items()) if count > target}
+        below = {label: target for label, count in sorted(counts.items()) if count < target}
+        X_resampled, y_resampled = X, labels
+        if above:
+            X_resampled, y_resampled = RandomUnderSampler(
+                sampling_strategy=above, random_state=self.random_state).fit_resample(X_resampled, y_resampled)
+        interpolated = {label: size for label, size in below.items() if counts[label] >= 2}
+        duplicated = {label: size for label, size in below.items() if counts[label] < 2}
+        if interpolated:
+            # SMOTE needs more samples than neighbours in every class it oversamples
+            k_neighbors = min(self.k_neighbors, min(counts[label] for label in interpolated) - 1)
+            X_resampled, y_resampled = SMOTE(sampling_strategy=interpolated, k_neighbors=k_neighbors,
+                                             random_state=self.random_state).fit_resample(X_resampled, y_resampled)
+        if duplicated:
+            X_resampled, y_resampled = RandomOverSampler(
+                sampling_strategy=duplicated, random_state=self.random_state).fit_resample(X_resampled, y_resampled)
+        X_resampled = sp.csr_matrix(X_resampled)
+
+        self.report_ = {
+            'rows_before': X.shape[0],
+            'rows_after': X_resampled.shape[0],
+            'synthetic_rows': int(sum(target - counts[label] for label in interpolated)),
+            'duplicated_rows': int(sum(target - counts[label] for label in duplicated)),
+            'undersampled_rows': int(sum(counts[label] - target for label in above)),
+            'mb_before': sparse_nbytes(X) / 1024 ** 2,
+            'mb_after': sparse_nbytes(X_resampled) / 1024 ** 2,
+            # The densified matrix the old preview built, for comparison
+            'dense_mb_after': X_resampled.shape[0] * X_resampled.shape[1] * 8 / 1024 ** 2,
+            'class_counts_before': {str(label): count for label, count in sorted(counts.items())},
+            'class_counts_after': {str(label): count for label, count in sorted(Counter(y_resampled).items())}
+        }
+        if isinstance(y, pd.Series):
+            y_resampled = pd.Series(y_resampled, name=y.name)
+        return X_resampled, y_resampled
+
+    def print_report(self):
+        report = self.report_
+        print(f"Rebalanced {report['rows_before']} -> {report['rows_after']} rows "
+              f"({report['synthetic_rows']} synthetic, {report['duplicated_rows']} duplicated, "
+              f"{report['undersampled_rows']} undersampled)")
+        print(f"  Sparse matrix {report['mb_before']:.1f} MB -> {report['mb_after']:.1f} MB "
+              f"(dense it would be {report['dense_mb_after']:.1f} MB)")
+        print(f"  Class counts {report['class_counts_before']} -> {report['class_counts_after']}")
+
+
+# A few random rows of a sparse matrix with their strongest terms, without converting the matrix to dense
+def sparse_preview(X, labels, feature_names=None, n_rows=5, n_terms=10, random_state=42):
+    X = sp.csr_matrix(X)
+    labels = np.asarray(labels)
+    rows = np.sort(np.random.RandomState(random_state).choice(X.shape[0], size=min(n_rows, X.shape[0]), replace=False))
+    preview = []
+    for row in rows:
+        start, end = X.indptr[row], X.indptr[row + 1]
+        columns, values = X.indices[start:end], X.data[start:end]
+        strongest = np.argsort(-values, kind='stable')[:n_terms]
+        names = feature_names[columns[strongest]] if feature_names is not None else columns[strongest]
+        preview.append({
+            'row': int(row),
+            'label': labels[row],
+            'non_zeros': end - start,
+            'top_terms': ', '.join(f'{name}:{value:.3f}' for name, value in zip(names, values[strongest]))
+        })
+    return pd.DataFrame(preview)
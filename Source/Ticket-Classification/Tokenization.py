@@ -1,34 +1,90 @@
+from functools import lru_cache
 from imblearn.over_sampling import SMOTE
 import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import TfidfTransformer
 from gensim.models import Word2Vec
-from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.tokenize import word_tokenize
 import nltk
-nltk.download('punkt')
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+from Feature_hashing import create_vectorizer
+from Sparse_rebalancing import SparseRebalancer, sparse_preview
+from W2V_embedding import DocumentEmbedder
+from W2V_store import load_or_train_keyed_vectors
+
+# Importing this module is cheap: the data, the TF-IDF features and the Word2Vec embeddings are only built by the
+# get_* functions, once per process, when a consumer asks for them. The DL scripts e.g. only build the embeddings:
+#   train_embeddings, test_embeddings = get_word2vec_features()
+# The former module-level names map to them: X_train_tf, X_test_tf, count_vect, tfidf_transformer =
+# get_tfidf_features(), X_train_tf_resampled, train_labels_resampled = get_resampled_tfidf_features(),
+# train_labels, test_labels = get_labels(), w2v_model = get_word2vec_model().
 
 # ---------------------------------------------------------------- Choose right columns ----------------------------------------------------
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# 'vocabulary' counts the terms with a CountVectorizer fitted in parallel shards, 'hashing' hashes them without a
+# vocabulary in parallel chunks
+feature_mode = 'vocabulary'
 
-# Keep the columns "complaint_what_happened" & "category_encoded" only in the new dataframe --> training_data
-ticket_data = df_clean['complaint_what_happened_without_stopwords']
-label_data = df_clean['category_encoded']
+# max_samples_per_class caps every class (undersampling above it) and bounds the synthetic samples
+max_samples_per_class = 5000
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.2, random_state=42, shuffle=True)
+# Word2Vec settings, together with the training texts they key the persisted vectors
+w2v_params = {'vector_size': 250, 'window': 5, 'min_count': 7}
+
+# SMOTE for the Word2Vec embeddings of the DL models
+smote = SMOTE(random_state=42)
+
+
+# The punkt models of word_tokenize are only downloaded when missing (punkt_tab is the format of newer nltk)
+@lru_cache(maxsize=None)
+def ensure_punkt():
+    for resource in ('punkt', 'punkt_tab'):
+        try:
+            nltk.data.find(f'tokenizers/{resource}')
+        except LookupError:
+            nltk.download(resource)
+
+
+# Load only the columns used below from the memory-mapped dataset store
+@lru_cache(maxsize=None)
+def load_data():
+    return load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'complaint_what_happened_basic_clean_DL', 'category_encoded'])
+
+
+# Load the shared training and testing split, computed once and persisted as index arrays
+@lru_cache(maxsize=None)
+def get_split():
+    return load_split(CANONICAL_SPLIT, load_data()['category_encoded'])
+
+
+def _train_test(column):
+    data = load_data()[column]
+    split = get_split()
+    return data.iloc[split['train']], data.iloc[split['test']]
+
+
+# Texts for the TF-IDF features: "complaint_what_happened" without stopwords
+def get_texts():
+    return _train_test('complaint_what_happened_without_stopwords')
+
+
+# Texts for Word2Vec: the basic cleaned complaints
+def get_texts_w2v():
+    return _train_test('complaint_what_happened_basic_clean_DL')
+
+
+def get_labels():
+    return _train_test('category_encoded')
 
 
 # ----------------------------------------------------------------- Tokenization with Tfidf ----------------------------------------------------------
 
 def Tfidf_method(training_data, count_vect=None, tfidf_transformer=None):
     if count_vect is None:
-        count_vect = CountVectorizer()
+        count_vect = create_vectorizer(feature_mode, n_jobs=-1)
         X_train_counts = count_vect.fit_transform(training_data)
         tfidf_transformer = TfidfTransformer()
         X_train_tf = tfidf_transformer.fit_transform(X_train_counts)
@@ -37,31 +93,32 @@ def Tfidf_method(training_data, count_vect=None, tfidf_transformer=None):
         X_train_tf = tfidf_transformer.transform(X_train_counts)
     return X_train_tf, count_vect, tfidf_transformer
 
-# Apply TF-IDF method to train and test data
-X_train_tf, count_vect, tfidf_transformer = Tfidf_method(train_texts)
-X_test_tf, _, _ = Tfidf_method(test_texts, count_vect, tfidf_transformer)
 
+# Apply TF-IDF method to train and test data, returns (X_train_tf, X_test_tf, count_vect, tfidf_transformer)
+@lru_cache(maxsize=None)
+def get_tfidf_features():
+    train_texts, test_texts = get_texts()
+    X_train_tf, count_vect, tfidf_transformer = Tfidf_method(train_texts)
+    X_test_tf, _, _ = Tfidf_method(test_texts, count_vect, tfidf_transformer)
+    return X_train_tf, X_test_tf, count_vect, tfidf_transformer
 
-import matplotlib.pyplot as plt
-import numpy as np
-from collections import Counter
 
-# Handle class imbalance using SMOTE on TF-IDF features
-smote = SMOTE(random_state=42)
-X_train_tf_resampled, train_labels_resampled = smote.fit_resample(X_train_tf, train_labels) # type: ignore
+# Handle class imbalance on the TF-IDF features without leaving the CSR format,
+# returns (X_train_tf_resampled, train_labels_resampled)
+@lru_cache(maxsize=None)
+def get_resampled_tfidf_features():
+    X_train_tf = get_tfidf_features()[0]
+    train_labels = get_labels()[0]
+    rebalancer = SparseRebalancer(max_samples_per_class=max_samples_per_class, random_state=42)
+    X_train_tf_resampled, train_labels_resampled = rebalancer.fit_resample(X_train_tf, train_labels) # type: ignore
+    rebalancer.print_report()
+    return X_train_tf_resampled, train_labels_resampled
 
 
 # ----------------------------------------------------------------- Tokenization with Word2Vec ----------------------------------------------------------
 
-# Keep the columns "complaint_what_happened" & "category_encoded" only in the new dataframe --> training_data
-ticket_data_w2v = df_clean['complaint_what_happened_basic_clean_DL']
-label_data_w2v = df_clean['category_encoded']
-
-# Split the data into training and testing sets
-train_texts_w2v, test_texts_w2v, train_labels_w2v, test_labels_w2v = train_test_split(ticket_data_w2v, label_data_w2v, test_size=0.2, random_state=42, shuffle=True)
-
-
 def Word2vec_method(train_texts):
+    ensure_punkt()
     # Tokenize the training texts
     data = []
     for text in train_texts:
@@ -71,66 +128,69 @@ def Word2vec_method(train_texts):
             temp.append(j.lower())
         data.append(temp)
     # Train Word2Vec model
-    w2v_model = Word2Vec(sentences=data, vector_size=250, window=5, min_count=7, workers=4)
+    w2v_model = Word2Vec(sentences=data, workers=4, **w2v_params)
     return w2v_model
 
-# Function to average word vectors for each document
+# Function to average word vectors for each document, computed for all documents at once.
+# Takes a Word2Vec model or its KeyedVectors.
 def get_word2vec_embeddings(texts, model):
-    embeddings = []
-    for text in texts:
-        tokens = word_tokenize(text)
-        vectors = [model.wv[token] for token in tokens if token in model.wv]
-        if vectors:
-            vector = np.mean(vectors, axis=0)
-        else:
-            vector = np.zeros(model.vector_size)
-        embeddings.append(vector)
-    return np.array(embeddings)
+    ensure_punkt()
+    return DocumentEmbedder(getattr(model, 'wv', model), tokenizer=word_tokenize).transform(texts)
 
-# Apply Word2Vec method and create the 'tokens' 
-w2v_model = Word2vec_method(train_texts_w2v)
 
-train_embeddings = get_word2vec_embeddings(train_texts_w2v, w2v_model)
-test_embeddings = get_word2vec_embeddings(test_texts_w2v, w2v_model)
+# Apply Word2Vec method and create the 'tokens', the vectors are trained once, persisted and then loaded
+# memory-mapped read-only by every script using them (CNN, RNN, HNN)
+@lru_cache(maxsize=None)
+def get_word2vec_model():
+    return load_or_train_keyed_vectors(f'tokenization_{CANONICAL_SPLIT}', get_texts_w2v()[0], Word2vec_method, w2v_params)
 
-# Handle class imbalance using SMOTE on Word2Vec embeddings
-# train_embeddings_resampled, train_labels_resampled_w2v = smote.fit_resample(train_embeddings, train_labels) # type: ignore
+
+# Word2Vec embeddings of the training and testing texts, returns (train_embeddings, test_embeddings)
+@lru_cache(maxsize=None)
+def get_word2vec_features():
+    train_texts_w2v, test_texts_w2v = get_texts_w2v()
+    w2v_model = get_word2vec_model()
+    return get_word2vec_embeddings(train_texts_w2v, w2v_model), get_word2vec_embeddings(test_texts_w2v, w2v_model)
 
 
 # ----------------------------------------------------------------- View Data ----------------------------------------------------------
 
-# Check for get_feature_names_out or fall back to get_feature_names
-try:
-    feature_names = count_vect.get_feature_names_out()
-except AttributeError:
-    feature_names = count_vect.get_feature_names() # type: ignore
+def view_data():
+    X_train_tf_resampled, train_labels_resampled = get_resampled_tfidf_features()
+    count_vect = get_tfidf_features()[2]
+    train_embeddings, test_embeddings = get_word2vec_features()
+    train_labels, test_labels = get_labels()
+
+    # The hashed features have no names, their column numbers are shown instead
+    feature_names = count_vect.get_feature_names_out() if feature_mode == 'vocabulary' else None
 
-# Convert the resampled TF-IDF data to a DataFrame for viewing
-tfidf_df = pd.DataFrame(X_train_tf_resampled.toarray(), columns=feature_names) # type: ignore
-tfidf_df['label'] = train_labels_resampled.values
+    # Sampled sparse preview of the resampled TF-IDF data: the strongest terms of a few rows, the matrix stays sparse
+    tfidf_preview = sparse_preview(X_train_tf_resampled, train_labels_resampled, feature_names)
 
-# Display a few rows of the TF-IDF DataFrame
-print("TF-IDF Features with Resampled Labels:")
-print(tfidf_df.head())
+    # Display a few rows of the TF-IDF preview
+    print("TF-IDF Features with Resampled Labels:")
+    print(tfidf_preview)
 
-# Convert the resampled Word2Vec embeddings to a DataFrame for viewing
-w2v_df = pd.DataFrame(test_embeddings)
-w2v_df['label'] = test_labels.values
+    # Convert the resampled Word2Vec embeddings to a DataFrame for viewing
+    w2v_df = pd.DataFrame(test_embeddings)
+    w2v_df['label'] = test_labels.values
 
-# Display a few rows of the Word2Vec DataFrame
-print("\nWord2Vec Embeddings with Resampled Labels:")
-print(w2v_df.head(17))
+    # Display a few rows of the Word2Vec DataFrame
+    print("\nWord2Vec Embeddings with Resampled Labels:")
+    print(w2v_df.head(17))
 
 
-# Convert the resampled Word2Vec embeddings to a DataFrame for viewing
-w2v_df = pd.DataFrame(train_embeddings)
-w2v_df['label'] = train_labels.values
+    # Convert the resampled Word2Vec embeddings to a DataFrame for viewing
+    w2v_df = pd.DataFrame(train_embeddings)
+    w2v_df['label'] = train_labels.values
 
-# Display a few rows of the Word2Vec DataFrame
-print("\nWord2Vec Embeddings with Resampled Labels:")
-print(w2v_df.head(17))
+    # Display a few rows of the Word2Vec DataFrame
+    print("\nWord2Vec Embeddings with Resampled Labels:")
+    print(w2v_df.head(17))
 
-print("Train", train_embeddings.shape)
-print("label", train_labels.shape)
+    print("Train", train_embeddings.shape)
+    print("label", train_labels.shape)
 
 
+if __name__ == '__main__':
+    view_data()
@@ -0,0 +1,78 @@
+import sys
+import time
+import numpy as np
+import scipy.sparse as sp
+
+
+# Document embeddings as the mean of the Word2Vec vectors of their tokens, computed for a whole batch at once.
+# The corpus is mapped once to a sparse document x vocabulary count matrix, the means are then one sparse x dense
+# product with the embedding matrix. With fit_idf the mean is weighted by the TF-IDF of the tokens instead.
+class DocumentEmbedder:
+    def __init__(self, keyed_vectors, tokenizer=str.split):
+        self.keyed_vectors = keyed_vectors
+        self.tokenizer = tokenizer
+        self.idf_ = None
+
+    # Token counts of every document over the Word2Vec vocabulary, tokens without a vector are left out
+    def token_counts(self, texts):
+        key_to_index = self.keyed_vectors.key_to_index
+        indices = []
+        indptr = [0]
+        for text in texts:
+            indices.extend(index for index in map(key_to_index.get, self.tokenizer(text)) if index is not None)
+            indptr.append(len(indices))
+        counts = sp.csr_matrix((np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr)),
+                               shape=(len(indptr) - 1, len(key_to_index)))
+        counts.sum_duplicates()
+        return counts
+
+    # Smoothed IDF of the vocabulary over the texts, like the default TfidfTransformer
+    def fit_idf(self, texts):
+        counts = self.token_counts(texts)
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf_ = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+        return self
+
+    def transform(self, texts):
+        counts = self.token_counts(texts)
+        if self.idf_ is not None:
+            counts = counts @ sp.diags(self.idf_)
+        totals = np.asarray(counts.sum(axis=1)).ravel()
+        sums = counts @ self.keyed_vectors.vectors
+        # Documents without any known token keep a zero vector
+        embeddings = np.divide(sums, totals[:, None], out=np.zeros_like(sums), where=totals[:, None] > 0)
+        return embeddings.astype(self.keyed_vectors.vectors.dtype)
+
+
+# The per-token loop the embedder replaces, kept for the benchmark
+def loop_embeddings(texts, keyed_vectors, tokenizer=str.split):
+    embeddings = []
+    for text in texts:
+        vectors = [keyed_vectors[token] for token in tokenizer(text) if token in keyed_vectors]
+        embeddings.append(np.mean(vectors, axis=0) if vectors else np.zeros(keyed_vectors.vector_size))
+    return np.array(embeddings)
+
+
+if __name__ == '__main__':
+    from gensim.models import Word2Vec
+    from Dataset_store import load_dataset
+
+    # python W2V_embedding.py [path of the dataset store]
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
+    texts = load_dataset(file_path, columns=['complaint_what_happened_basic_clean_DL'])['complaint_what_happened_basic_clean_DL']
+    texts = texts.fillna('').tolist()
+
+    # Same settings as Word2vec_method in Tokenization.py
+    keyed_vectors = Word2Vec(sentences=[text.split() for text in texts], vector_size=250, window=5, min_count=7,
+                             workers=4).wv
+
+    start = time.perf_counter()
+    expected = loop_embeddings(texts, keyed_vectors)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = DocumentEmbedder(keyed_vectors).transform(texts)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"{len(texts)} documents: loop {loop_seconds:.2f}s, batch {batch_seconds:.2f}s "
+          f"({loop_seconds / batch_seconds:.1f}x), max difference {np.abs(expected - embeddings).max():.2e}")
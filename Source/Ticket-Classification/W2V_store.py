@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import numpy as np
+from gensim.models import KeyedVectors
+
+
+# Directory of the persisted Word2Vec vectors shared by the DL scripts and the grid-search workers
+W2V_DIR = "/home/users/elicina/Master-Thesis/Models/W2V"
+
+
+# Fingerprint of the training texts, other training rows invalidate the persisted vectors
+def texts_fingerprint(texts):
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(str(text).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# Hash of the vectors and their vocabulary, names the files of a trained model and of the embeddings it produced
+def vectors_hash(keyed_vectors):
+    digest = hashlib.sha1()
+    digest.update(json.dumps(keyed_vectors.index_to_key).encode('utf-8'))
+    digest.update(np.ascontiguousarray(keyed_vectors.vectors).tobytes())
+    return digest.hexdigest()
+
+
+# Save the vectors with the embedding matrix as a separate .npy file so it can be memory-mapped.
+# Both files are written under a temporary name first, readers never see a partial model.
+def save_keyed_vectors(keyed_vectors, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    keyed_vectors.save(tmp_path, separately=['vectors'])
+    os.replace(f'{tmp_path}.vectors.npy', f'{path}.vectors.npy')
+    os.replace(tmp_path, path)
+
+
+# The embedding matrix is mapped read-only, all processes loading it share one physical copy
+def load_keyed_vectors(path):
+    return KeyedVectors.load(path, mmap='r')
+
+
+def _remove_keyed_vectors(path):
+    for file_path in (path, f'{path}.vectors.npy'):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _manifest_path(model_dir, name):
+    return os.path.join(model_dir, f'{name}.kv.json')
+
+
+def _read_manifest(model_dir, name):
+    if not os.path.exists(_manifest_path(model_dir, name)):
+        return None
+    with open(_manifest_path(model_dir, name)) as f:
+        return json.load(f)
+
+
+# Path of the persisted vectors when they were trained with the same parameters on the same texts, otherwise train
+# them with train_fn(texts) (a Word2Vec model or KeyedVectors) and persist them.
+# Every trained model is saved under the hash of its vectors (<name>.<hash>.kv) and published by creating the
+# manifest <name>.kv.json, which names the file. The manifest is created with a hard link, only the first of
+# concurrent processes training the same vectors publishes its model, the others drop theirs and use the first one.
+# A manifest of other parameters or texts is replaced together with the files it names.
+def train_or_find_keyed_vectors(name, texts, train_fn, params, model_dir=W2V_DIR):
+    texts = list(texts)
+    entry = {'params': params, 'fingerprint': texts_fingerprint(texts), 'n_texts': len(texts)}
+    manifest = _read_manifest(model_dir, name)
+    if manifest is not None and {key: manifest.get(key) for key in entry} == entry:
+        return os.path.join(model_dir, manifest['vectors'])
+
+    model = train_fn(texts)
+    keyed_vectors = getattr(model, 'wv', model)
+    digest = vectors_hash(keyed_vectors)
+    path = os.path.join(model_dir, f'{name}.{digest[:16]}.kv')
+    save_keyed_vectors(keyed_vectors, path)
+
+    entry.update(vectors=os.path.basename(path), vectors_hash=digest)
+    tmp_path = f'{_manifest_path(model_dir, name)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f, indent=2)
+    try:
+        os.link(tmp_path, _manifest_path(model_dir, name))
+    except FileExistsError:
+        published = _read_manifest(model_dir, name)
+        if {key: published.get(key) for key in ('params', 'fingerprint', 'n_texts')} == \
+                {key: entry[key] for key in ('params', 'fingerprint', 'n_texts')}:
+            # Another process was faster with the same vectors, its model is the one every process uses
+            os.remove(tmp_path)
+            if published['vectors'] != entry['vectors']:
+                _remove_keyed_vectors(path)
+            return os.path.join(model_dir, published['vectors'])
+        # Vectors of other parameters or texts are replaced, open mappings of their files stay valid
+        os.replace(tmp_path, _manifest_path(model_dir, name))
+        if published['vectors'] != entry['vectors']:
+            _remove_keyed_vectors(os.path.join(model_dir, published['vectors']))
+        return path
+    os.remove(tmp_path)
+    return path
+
+
+# The persisted vectors of train_or_find_keyed_vectors, mapped; the trained model in memory can be freed
+def load_or_train_keyed_vectors(name, texts, train_fn, params, model_dir=W2V_DIR):
+    return load_keyed_vectors(train_or_find_keyed_vectors(name, texts, train_fn, params, model_dir))
+
+
+# Document embeddings cached as .npy next to the vectors that produced them, computed with compute_fn() on a miss.
+# The path should contain the hash of the vectors (the name of their file does). The first complete writer wins,
+# the embeddings of a concurrent process are not written over.
+def load_or_compute_embeddings(path, compute_fn):
+    if os.path.exists(path):
+        return np.load(path)
+    embeddings = compute_fn()
+    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, embeddings)
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        # Another process was faster, every process uses its embeddings
+        embeddings = np.load(path)
+    os.remove(tmp_path)
+    return embeddings
+
+
+# Number and size of the persisted vectors and document embeddings of a cache directory
+def cache_summary(cache_dir):
+    files = os.listdir(cache_dir) if os.path.isdir(cache_dir) else []
+    # the temp files of writes still in progress are not cached yet
+    files = [name for name in files if '.tmp' not in name]
+    vectors = [name for name in files if name.endswith('.kv')]
+    embeddings = [name for name in files if name.endswith('.npy') and not name.endswith('.vectors.npy')]
+    size = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in files)
+    return {'vectors': len(vectors), 'embeddings': len(embeddings), 'mb': size / 1024 ** 2}
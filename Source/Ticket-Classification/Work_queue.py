@@ -0,0 +1,314 @@
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import joblib
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, check_cv
+from Checkpointed_search import append_record, fit_and_score, read_records, search_key, search_results
+
+
+# Directory of the work queue on the shared file system, seen by all nodes of the SLURM job
+QUEUE_DIR = "/home/users/elicina/Master-Thesis/Models/Search-Queue"
+
+# Seconds after which the heartbeat file of a process that stopped touching it counts as dead
+HEARTBEAT_SECONDS = 60
+
+# Layout of the queue directory:
+#   workers/<worker>    heartbeat of every running worker
+#   closed              created by the driver once no more searches will be enqueued
+# and of every search in it, search_<key>/:
+#   driver              heartbeat of the driver waiting for the results, workers skip searches without a live driver
+#   search.pkl          estimator, candidates, fold positions, data and scoring, loaded once by every worker
+#   pending/            one empty file per (candidate, fold) unit still to fit
+#   claimed/<worker>/   the units a worker is fitting, taken from pending/ with an atomic rename, the modification time
+#                       of a claimed unit is the time it was claimed
+#   results/<worker>.jsonl  the fit records of a worker, appended like the checkpoint of CheckpointedSearchCV
+# A worker takes one unit at a time, a fast worker simply takes more units: a slow SVC-rbf candidate only keeps its
+# own worker busy. The finished units of all workers are merged into one ranking by the search. The units claimed
+# by a dead worker are put back to pending/ by the search, those of a live worker only after claim_seconds.
+
+
+def _unit_name(candidate, fold):
+    return f'c{candidate:06d}_f{fold:03d}'
+
+
+def _parse_unit(name):
+    candidate, fold = name.split('_')
+    return int(candidate[1:]), int(fold[1:])
+
+
+def _search_dirs(queue_dir):
+    if not os.path.isdir(queue_dir):
+        return []
+    return sorted(os.path.join(queue_dir, name) for name in os.listdir(queue_dir) if name.startswith('search_'))
+
+
+# Touch the file from a daemon thread while the process runs, the file is removed when the block ends
+class Heartbeat:
+    def __init__(self, path):
+        self.path = path
+
+    def _touch(self):
+        open(self.path, 'a').close()
+        os.utime(self.path)
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS / 4):
+            self._touch()
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._touch()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _is_alive(heartbeat_path):
+    try:
+        return time.time() - os.path.getmtime(heartbeat_path) < HEARTBEAT_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _merged_records(search_dir):
+    records = {}
+    results_dir = os.path.join(search_dir, 'results')
+    for name in sorted(os.listdir(results_dir)):
+        records.update(read_records(os.path.join(results_dir, name)))
+    return records
+
+
+# Put the claimed units without a result back to pending/: all units of dead workers, and the units of live workers
+# claimed for claim_seconds (a unit still fitted is fitted twice at worst, both records are the same).
+# Returns the number of units put back.
+def requeue_claims(search_dir, claim_seconds=3600):
+    done = _merged_records(search_dir)
+    claimed_dir = os.path.join(search_dir, 'claimed')
+    n_units = 0
+    for worker in os.listdir(claimed_dir):
+        alive = _is_alive(os.path.join(os.path.dirname(search_dir), 'workers', worker))
+        for name in os.listdir(os.path.join(claimed_dir, worker)):
+            path = os.path.join(claimed_dir, worker, name)
+            if _parse_unit(name) in done:
+                continue
+            try:
+                if alive and time.time() - os.path.getmtime(path) < claim_seconds:
+                    continue
+                os.replace(path, os.path.join(search_dir, 'pending', name))
+            except FileNotFoundError:
+                # The worker finished the unit meanwhile
+                continue
+            n_units += 1
+    return n_units
+
+
+# Put the search into the queue, the units with a result from an earlier run are not queued again.
+# Units claimed by workers that died without a result (e.g. in an earlier run) go back to pending/.
+# Returns the search directory.
+def enqueue_search(queue_dir, estimator, param_grid, X, y, cv=5, scoring=None, claim_seconds=3600):
+    candidates = list(ParameterGrid(param_grid))
+    splits = list(check_cv(cv, y, classifier=True).split(X, y))
+    search_dir = os.path.join(queue_dir, f'search_{search_key(estimator, candidates, cv, scoring, X, y)}')
+    for name in ('pending', 'claimed', 'results'):
+        os.makedirs(os.path.join(search_dir, name), exist_ok=True)
+
+    # The units are only queued once the workers can load the search
+    spec_path = os.path.join(search_dir, 'search.pkl')
+    if not os.path.exists(spec_path):
+        tmp_path = f'{spec_path}.{os.getpid()}.tmp'
+        joblib.dump({'estimator': estimator, 'candidates': candidates, 'splits': splits, 'X': X, 'y': y,
+                     'scoring': scoring}, tmp_path)
+        os.replace(tmp_path, spec_path)
+
+    requeue_claims(search_dir, claim_seconds)
+    done = _merged_records(search_dir)
+    # The units still claimed by live workers are not queued a second time
+    claimed_dir = os.path.join(search_dir, 'claimed')
+    claimed = {_parse_unit(name) for worker in os.listdir(claimed_dir)
+               for name in os.listdir(os.path.join(claimed_dir, worker))}
+    for candidate in range(len(candidates)):
+        for fold in range(len(splits)):
+            if (candidate, fold) not in done and (candidate, fold) not in claimed:
+                open(os.path.join(search_dir, 'pending', _unit_name(candidate, fold)), 'a').close()
+    return search_dir
+
+
+# Take the next pending unit of any search for the worker, None when nothing is pending.
+# Searches without a live driver are skipped, nobody collects their results (a restarted driver resumes them).
+def claim_unit(queue_dir, worker_id):
+    for search_dir in _search_dirs(queue_dir):
+        if not _is_alive(os.path.join(search_dir, 'driver')):
+            continue
+        pending_dir = os.path.join(search_dir, 'pending')
+        worker_dir = os.path.join(search_dir, 'claimed', worker_id)
+        for name in sorted(os.listdir(pending_dir)) if os.path.isdir(pending_dir) else []:
+            os.makedirs(worker_dir, exist_ok=True)
+            try:
+                os.rename(os.path.join(pending_dir, name), os.path.join(worker_dir, name))
+            except FileNotFoundError:
+                # Another worker was faster
+                continue
+            # The rename keeps the modification time, it is set to the claim time for requeue_claims
+            os.utime(os.path.join(worker_dir, name))
+            return search_dir, name
+    return None
+
+
+# Fit units until the queue is empty. With wait_seconds the worker keeps polling for new searches (the driver
+# enqueues one search per classifier, and refits and evaluates the best model in between) until the queue is
+# closed. wait_seconds without work is only a safety net for a driver that never closes the queue, it has to be
+# longer than the slowest step of the driver. A unit failing in any way is recorded with a nan score.
+def run_worker(queue_dir=QUEUE_DIR, worker_id=None, wait_seconds=0, poll_seconds=5):
+    worker_id = worker_id or f'{socket.gethostname()}_{os.getpid()}'
+    specs = {}
+    n_units = 0
+    # The heartbeat tells the search that the claims of the worker are being fitted
+    with Heartbeat(os.path.join(queue_dir, 'workers', worker_id)):
+        idle_since = time.monotonic()
+        while True:
+            unit = claim_unit(queue_dir, worker_id)
+            if unit is None:
+                if os.path.exists(os.path.join(queue_dir, 'closed')) or time.monotonic() - idle_since >= wait_seconds:
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            search_dir, name = unit
+            if search_dir not in specs:
+                specs[search_dir] = joblib.load(os.path.join(search_dir, 'search.pkl'))
+            spec = specs[search_dir]
+            candidate, fold = _parse_unit(name)
+            try:
+                record = fit_and_score(spec['estimator'], candidate, spec['candidates'][candidate], fold, spec['X'],
+                                       spec['y'], *spec['splits'][fold], spec['scoring'])
+            except Exception as error:
+                record = {'candidate': candidate, 'fold': fold, 'params': spec['candidates'][candidate],
+                          'error': repr(error), 'score': float('nan'), 'fit_seconds': 0.0, 'score_seconds': 0.0}
+            record['worker'] = worker_id
+            with open(os.path.join(search_dir, 'results', f'{worker_id}.jsonl'), 'a') as f:
+                append_record(f, record)
+            # The result is on disk, the unit is done (unless a restarted search put it back to pending/ meanwhile)
+            try:
+                os.remove(os.path.join(search_dir, 'claimed', worker_id, name))
+            except FileNotFoundError:
+                pass
+            n_units += 1
+            idle_since = time.monotonic()
+    print(f"Worker {worker_id} fitted {n_units} units")
+    return n_units
+
+
+# Local stand-in of the SLURM workers: n_workers processes on this machine drain the queue
+def run_local_workers(queue_dir, n_workers):
+    workers = [multiprocessing.Process(target=run_worker, args=(queue_dir, f'local_{index}'))
+               for index in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+# Tell the polling workers that no more searches will be enqueued
+def close_queue(queue_dir):
+    os.makedirs(queue_dir, exist_ok=True)
+    open(os.path.join(queue_dir, 'closed'), 'a').close()
+
+
+# Units of every search of the queue: pending, claimed and done, the workers that fitted them and whether a driver
+# waits for the search
+def queue_status(queue_dir=QUEUE_DIR):
+    status = {}
+    for search_dir in _search_dirs(queue_dir):
+        claimed_dir = os.path.join(search_dir, 'claimed')
+        records = _merged_records(search_dir)
+        status[os.path.basename(search_dir)] = {
+            'pending': len(os.listdir(os.path.join(search_dir, 'pending'))),
+            'claimed': sum(len(os.listdir(os.path.join(claimed_dir, worker))) for worker in os.listdir(claimed_dir)),
+            'done': len(records),
+            'workers': len({record.get('worker') for record in records.values()}),
+            'active': _is_alive(os.path.join(search_dir, 'driver'))
+        }
+    return status
+
+
+# Grid search whose (candidate, fold) units are fitted by the workers of the queue, used like GridSearchCV.
+# With n_workers the search starts that many local worker processes, with n_workers=None it waits for the workers
+# started by SLURM on the other nodes (python Work_queue.py worker <queue_dir>). The results of all workers are
+# merged into one ranking in (candidate, fold) order, an interrupted search resumes from them.
+# The units of dead workers are queued again, those of live workers after claim_seconds without a result.
+# The search raises when it has not all results after timeout_seconds.
+class QueueSearchCV:
+    def __init__(self, estimator, param_grid, queue_dir=QUEUE_DIR, cv=5, scoring=None, n_workers=None, refit=True,
+                 poll_seconds=5, claim_seconds=3600, timeout_seconds=24 * 3600):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.queue_dir = queue_dir
+        self.cv = cv
+        self.scoring = scoring
+        self.n_workers = n_workers
+        self.refit = refit
+        self.poll_seconds = poll_seconds
+        self.claim_seconds = claim_seconds
+        self.timeout_seconds = timeout_seconds
+
+    def fit(self, X, y):
+        search_dir = enqueue_search(self.queue_dir, self.estimator, self.param_grid, X, y, self.cv, self.scoring,
+                                    self.claim_seconds)
+        spec = joblib.load(os.path.join(search_dir, 'search.pkl'))
+        candidates, n_splits = spec['candidates'], len(spec['splits'])
+
+        # The workers only fit the units of the search while this driver waits for them
+        with Heartbeat(os.path.join(search_dir, 'driver')):
+            deadline = time.monotonic() + self.timeout_seconds
+            records = _merged_records(search_dir)
+            while len(records) < len(candidates) * n_splits:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"{search_dir}: {len(records)} of {len(candidates) * n_splits} units fitted "
+                                       f"after {self.timeout_seconds} seconds")
+                # The local workers have ended, the units they left are queued again at once
+                requeue_claims(search_dir, self.claim_seconds)
+                if self.n_workers and os.listdir(os.path.join(search_dir, 'pending')):
+                    run_local_workers(self.queue_dir, self.n_workers)
+                else:
+                    time.sleep(self.poll_seconds)
+                records = _merged_records(search_dir)
+
+        self.cv_results_, self.best_index_ = search_results(records, candidates, n_splits)
+        self.n_splits_ = n_splits
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+        self.units_per_worker_ = {}
+        for record in records.values():
+            worker = record.get('worker')
+            self.units_per_worker_[worker] = self.units_per_worker_.get(worker, 0) + 1
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+
+if __name__ == '__main__':
+    # python Work_queue.py worker [queue dir] [seconds to wait for work if the queue is never closed]
+    # python Work_queue.py status [queue dir]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    queue_dir = sys.argv[2] if len(sys.argv) > 2 else QUEUE_DIR
+    if command == 'worker':
+        run_worker(queue_dir, wait_seconds=float(sys.argv[3]) if len(sys.argv) > 3 else 24 * 3600)
+    elif command == 'status':
+        for name, search in queue_status(queue_dir).items():
+            print(f"{name}: {search['done']} done, {search['claimed']} claimed, {search['pending']} pending, "
+                  f"{search['workers']} workers{'' if search['active'] else ', no driver'}")
+    else:
+        sys.exit(f"Unknown command '{command}', use 'worker' or 'status'")
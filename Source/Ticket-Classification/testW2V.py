@@ -1,27 +1,28 @@
 from imblearn.over_sampling import SMOTE
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.model_selection import train_test_split
 from gensim.models import Word2Vec
-from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.tokenize import word_tokenize
 import nltk
+from Dataset_store import load_dataset
+from Data_splits import CANONICAL_SPLIT, load_split
+from W2V_embedding import DocumentEmbedder
 nltk.download('punkt')
 
 # ---------------------------------------------------------------- Choose right columns ----------------------------------------------------
 
-# Specify the file path of your CSV file
-file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.csv"
+# Specify the file path of the columnar dataset store
+file_path = "/home/users/elicina/Master-Thesis/Dataset/Cleaned_Dataset.parquet"
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# Load only the columns used below from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened_without_stopwords', 'complaint_what_happened_basic_clean_DL', 'category_encoded'])
 
 # Keep the columns "complaint_what_happened" & "category_encoded" only in the new dataframe --> training_data
 ticket_data = df_clean['complaint_what_happened_without_stopwords']
 label_data = df_clean['category_encoded']
 
-# Split the data into training and testing sets
-train_texts, test_texts, train_labels, test_labels = train_test_split(ticket_data, label_data, test_size=0.2, random_state=42, shuffle=True)
+# Load the shared training and testing split, computed once and persisted as index arrays
+split = load_split(CANONICAL_SPLIT, label_data)
+train_texts, test_texts = ticket_data.iloc[split['train']], ticket_data.iloc[split['test']]
+train_labels, test_labels = label_data.iloc[split['train']], label_data.iloc[split['test']]
 
 
 
@@ -31,8 +32,9 @@ label_data_w2v = df_clean['category_encoded']
 
 smote = SMOTE(random_state=42)
 
-# Split the data into training and testing sets
-train_texts_w2v, test_texts_w2v, train_labels_w2v, test_labels_w2v = train_test_split(ticket_data_w2v, label_data_w2v, test_size=0.2, random_state=42, shuffle=True)
+# Same rows as the TF-IDF split above
+train_texts_w2v, test_texts_w2v = ticket_data_w2v.iloc[split['train']], ticket_data_w2v.iloc[split['test']]
+train_labels_w2v, test_labels_w2v = label_data_w2v.iloc[split['train']], label_data_w2v.iloc[split['test']]
 
 
 def Word2vec_method(train_texts):
@@ -48,18 +50,9 @@ def Word2vec_method(train_texts):
     w2v_model = Word2Vec(sentences=data, vector_size=250, window=5, min_count=7, workers=4)
     return w2v_model
 
-# Function to average word vectors for each document
+# Function to average word vectors for each document, computed for all documents at once
 def get_word2vec_embeddings(texts, model):
-    embeddings = []
-    for text in texts:
-        tokens = word_tokenize(text)
-        vectors = [model.wv[token] for token in tokens if token in model.wv]
-        if vectors:
-            vector = np.mean(vectors, axis=0)
-        else:
-            vector = np.zeros(model.vector_size)
-        embeddings.append(vector)
-    return np.array(embeddings)
+    return DocumentEmbedder(model.wv, tokenizer=word_tokenize).transform(texts)
 
 # Apply Word2Vec method and create the 'tokens' 
 w2v_model = Word2vec_method(train_texts_w2v)
@@ -78,12 +71,7 @@ original_text_row = ticket_data_w2v.iloc[0]
 
 # Function to get Word2Vec embeddings for a single text
 def get_word2vec_embedding_for_text(text, model):
-    tokens = word_tokenize(text)
-    vectors = [model.wv[token] for token in tokens if token in model.wv]
-    if vectors:
-        return np.mean(vectors, axis=0)
-    else:
-        return np.zeros(model.vector_size)
+    return get_word2vec_embeddings([text], model)[0]
 
 # Get the Word2Vec embedding for the example text
 example_embedding = get_word2vec_embedding_for_text(original_text_row, w2v_model)
@@ -1,17 +1,25 @@
+import os
+import sys
 import joblib
 
+# The text normalizer lives next to the preprocessing code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Topic-Moddeling'))
+from Text_normalizer import TextNormalizer
+
 # Load the model
 loaded_model = joblib.load('/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/xgb_model.pkl')
 # Load the objects
 vect = joblib.load('/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/count_vect.pkl')
 transformer = joblib.load('/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/tfidf_transformer.pkl')
+# Same cleaning rules as the training data
+normalizer = TextNormalizer.load_or_default('/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/normalizer.pkl')
 
 
 # Classify the new tickets
 def predict_lr(text):
     Topic_names = {0: 'Credit Reporting and Debt Collection', 1: 'Credit Cards and Prepaid Cards',
                    2: 'Bank Account or Service', 3: 'Loans', 4: 'Money Transfers and Financial Services'}
-    X_new_counts = vect.transform(text)
+    X_new_counts = vect.transform(normalizer.transform(text))
     X_new_tfidf = transformer.transform(X_new_counts)
     predicted = loaded_model.predict(X_new_tfidf)
     return Topic_names[predicted[0]]
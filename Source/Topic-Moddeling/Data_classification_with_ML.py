@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import plotly.express as px
 from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
@@ -6,18 +8,27 @@ from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.naive_bayes import MultinomialNB
 from xgboost import XGBClassifier
-from sklearn.model_selection import StratifiedKFold, GridSearchCV, train_test_split
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import roc_auc_score, accuracy_score, precision_score, recall_score, f1_score, classification_report
 from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
 import joblib
+from Text_normalizer import TextNormalizer
+
+# The dataset store helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join('..', 'Ticket-Classification'))
+from Dataset_store import load_dataset
+from Model_search import create_search, run_search, print_search_report
 
 # --------------------- Supervised model to predict any new complaints to the relevant Topics --------------------------
 
-# Specify the file path of your CSV file
-file_path = '../../Dataset/Cleaned_Dataset.csv'
+# Specify the file path of the columnar dataset store
+file_path = '../../Dataset/Cleaned_Dataset.parquet'
+
+# Load only the complaints and the topics from the memory-mapped dataset store
+df_clean = load_dataset(file_path, columns=['complaint_what_happened', 'Topic'])
 
-# Read the CSV file into a DataFrame
-df_clean = pd.read_csv(file_path)
+# The complaints were cleaned with this normalizer in Data_preprocessing, new tickets go through the same rules
+normalizer = TextNormalizer()
 
 # Keep the columns"complaint_what_happened" & "Topic" only in the new dataframe --> training_data
 training_data = df_clean[['complaint_what_happened','Topic']]
@@ -55,11 +66,19 @@ def eval_model(y_test,y_pred,y_pred_proba,type='Training'):
     disp.plot()
 
 
-# Function to grid search the best parameters for the model
+# 'grid' fits every candidate on all training rows, 'halving' (successive halving) starts all candidates on a few rows
+# and only fits the best third of them on three times more rows in every round, 'folds' stores the 5 folds once
+# in fold_dir and all models are fitted on the same mapped folds
+search_mode = 'grid'
+fold_dir = '../../Dataset/Folds/Topic-Classification'
+
+
+# Function to search the best parameters for the model
 def run_model(model,param_grid):
     cv=StratifiedKFold(n_splits=5,shuffle=True,random_state=40)
-    grid=GridSearchCV(model,param_grid=param_grid,cv=cv,scoring='f1_weighted',verbose=1,n_jobs=-1)
-    grid.fit(train_X,train_y)
+    grid=create_search(model,param_grid,search_mode,cv=cv,scoring='f1_weighted',verbose=1,n_jobs=-1,random_state=40,
+                       fold_dir=fold_dir)
+    print_search_report(run_search(grid,train_X,train_y))
     return grid.best_estimator_
 
 
@@ -153,7 +172,7 @@ df_complaints = pd.DataFrame({'complaints': ["I can not get from chase who servi
 
 def predict_lr(text):
     Topic_names = {0:'Account Services', 1:'Others', 2:'Mortgage/Loan', 3:'Credit card or prepaid card', 4:'Theft/Dispute Reporting'}
-    X_new_counts = count_vect.transform(text)
+    X_new_counts = count_vect.transform(normalizer.transform(text))
     X_new_tfidf = tfidf_transformer.transform(X_new_counts)
     predicted = model.predict(X_new_tfidf)
     return Topic_names[predicted[0]]
@@ -171,3 +190,4 @@ print(df_complaints)
 # # Saving the objects
 # joblib.dump(count_vect, '/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/count_vect.pkl')
 # joblib.dump(tfidf_transformer, '/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/tfidf_transformer.pkl')
+# normalizer.save('/Users/esada/Documents/UNI.lu/MICS/Master-Thesis/Model/normalizer.pkl')
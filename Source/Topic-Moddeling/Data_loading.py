@@ -0,0 +1,98 @@
+import json
+import numpy as np
+import pandas as pd
+
+
+# Short names for the flattened Elasticsearch fields of the complaints dump
+COLUMN_NAMES = {
+    '_index': 'index',
+    '_type': 'type',
+    '_id': 'id',
+    '_score': 'score',
+    '_source.tags': 'tags',
+    '_source.zip_code': 'zip_code',
+    '_source.complaint_id': 'complaint_id',
+    '_source.issue': 'issue',
+    '_source.date_received': 'date_received',
+    '_source.state': 'state',
+    '_source.consumer_disputed': 'consumer_disputed',
+    '_source.product': 'product',
+    '_source.company_response': 'company_response',
+    '_source.company': 'company',
+    '_source.submitted_via': 'submitted_via',
+    '_source.date_sent_to_company': 'date_sent_to_company',
+    '_source.company_public_response': 'company_public_response',
+    '_source.sub_product': 'sub_product',
+    '_source.timely': 'timely',
+    '_source.complaint_what_happened': 'complaint_what_happened',
+    '_source.sub_issue': 'sub_issue',
+    '_source.consumer_consent_provided': 'consumer_consent_provided'
+}
+
+
+# Yield the records of a top-level JSON array one by one without parsing the whole file
+def iter_json_array(f, block_size=1 << 20):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators between records
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Expected a JSON array at the top level of the file')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The record is cut at the end of the buffer, read more unless the file is finished
+                if eof:
+                    raise
+            else:
+                yield record
+                pos = end
+                continue
+        elif eof:
+            if started:
+                raise ValueError('Unexpected end of file inside the JSON array')
+            return
+
+        # Drop the consumed part of the buffer and read the next block
+        block = f.read(block_size)
+        buffer = buffer[pos:] + block
+        pos = 0
+        eof = not block
+
+
+# Normalize a list of raw records into a DataFrame with short column names
+def normalize_chunk(records):
+    chunk = pd.json_normalize(records)
+    chunk.rename(columns=COLUMN_NAMES, inplace=True)
+
+    # Assign nan in place of blanks and remove the empty complaints of this chunk
+    chunk['complaint_what_happened'] = chunk['complaint_what_happened'].replace('', np.nan)
+    chunk.dropna(subset=['complaint_what_happened'], inplace=True)
+    return chunk
+
+
+# Stream the complaints dump as normalized DataFrame chunks of chunk_size raw records
+def stream_complaints(file_path, chunk_size=10000):
+    with open(file_path) as f:
+        records = []
+        for record in iter_json_array(f):
+            records.append(record)
+            if len(records) == chunk_size:
+                yield normalize_chunk(records)
+                records = []
+        if records:
+            yield normalize_chunk(records)
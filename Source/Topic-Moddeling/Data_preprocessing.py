@@ -1,24 +1,31 @@
-import json
-import re
-import numpy as np
 import pandas as pd
 import warnings
 import plotly.express as px
 from matplotlib import pyplot as plt
 import plotly.graph_objects as go
-from sklearn.feature_extraction.text import CountVectorizer
 from tabulate import tabulate
 from tqdm import tqdm
 from wordcloud import WordCloud
-import spacy
+from Data_loading import stream_complaints
+from Lemmatization import LemmatizationEngine
+from Preprocessing_cache import PreprocessingCache
+from Text_normalizer import TextNormalizer, CLEAN_RULES
+from Ngram_statistics import NgramCounter
+from Pipeline_profiler import PipelineProfiler
+from Near_duplicates import NearDuplicateDetector, measure_svc_training_time, near_duplicate_report, print_near_duplicate_report
 
 
 
 tqdm.pandas()
 warnings.filterwarnings('ignore')
 
-# Load the English language model
-nlp = spacy.load("en_core_web_sm")
+# Wall time, CPU time, peak RSS and rows/sec of every stage, written as a JSON run report at the end
+profiler = PipelineProfiler('preprocessing')
+report_dir = '../../Diagrams/Run-Reports'
+
+# Load the English language model in a lemmatization engine running on all cores, parser and NER are disabled
+lemmatizer = LemmatizationEngine("en_core_web_sm", batch_size=1000, n_process=-1)
+nlp = lemmatizer.nlp
 
 # change the display properties of pandas to max
 pd.set_option('display.max_colwidth', None)
@@ -27,107 +34,116 @@ pd.set_option('display.max_rows', None)
 
 # -------------------------------------------------- Loading the data -------------------------------------------------
 
-# Opening JSON file
-f = open('../../Dataset/complaints-2021-05-14_08_16.json')
+# Path of the complaints dump and number of raw complaints per chunk
+data_path = '../../Dataset/complaints-2021-05-14_08_16.json'
+chunk_size = 10000
 
-# Returns JSON object as a dictionary
-data = json.load(f)
-df = pd.json_normalize(data)
+# Stream the JSON dump as normalized chunks instead of loading the whole file into memory,
+# the columns are renamed and the empty complaints are dropped per chunk
+chunks = profiler.iterate('loading', stream_complaints(data_path, chunk_size=chunk_size))
 
-# First 5 rows of the dataframe
-print(tabulate(df.head(), headers='keys', tablefmt='pretty'))
 
-# -------------------------------------------------- Data preparation -------------------------------------------------
+# ----------------------------------------- Prepare the text for topic modeling ----------------------------------------
 
-# Inspect the dataframe to understand the given data.
-print(df.info())
-
-# Print the column names
-print("Columns are: ", df.columns.values)
-
-# Assign new column names
-df.rename(columns={
-    '_index': 'index',
-    '_type': 'type',
-    '_id': 'id',
-    '_score': 'score',
-    '_source.tags': 'tags',
-    '_source.zip_code': 'zip_code',
-    '_source.complaint_id': 'complaint_id',
-    '_source.issue': 'issue',
-    '_source.date_received': 'date_received',
-    '_source.state': 'state',
-    '_source.consumer_disputed': 'consumer_disputed',
-    '_source.product': 'product',
-    '_source.company_response': 'company_response',
-    '_source.company': 'company',
-    '_source.submitted_via': 'submitted_via',
-    '_source.date_sent_to_company': 'date_sent_to_company',
-    '_source.company_public_response': 'company_public_response',
-    '_source.sub_product': 'sub_product',
-    '_source.timely': 'timely',
-    '_source.complaint_what_happened': 'complaint_what_happened',
-    '_source.sub_issue': 'sub_issue',
-    '_source.consumer_consent_provided': 'consumer_consent_provided'
-}, inplace=True)
-
-# Assign nan in place of blanks in the complaint_what_happened column
-df['complaint_what_happened'].replace('', np.nan, inplace=True)
-
-# Null values count after replacing blanks with nan
-df['complaint_what_happened'].isnull().sum()
-
-# Remove all rows where complaint_what_happened column is nan
-df.dropna(subset=['complaint_what_happened'], inplace=True)
+# Text normalizer with the clean_text rules compiled once, it cleans a whole chunk in one call
+normalizer = TextNormalizer()
 
 
-# ----------------------------------------- Prepare the text for topic modeling ----------------------------------------
-
 # Write your function here to clean the text and remove all the unnecessary elements.
 def clean_text(text):
-    text = text.lower()  # Convert to lower case
-    text = re.sub(r'^\[[\w\s]\]+$', ' ', text)  # Remove text in square brackets
-    text = re.sub(r'[^\w\s]', ' ', text)  # Remove punctuation
-    text = re.sub(r'^[a-zA-Z]\d+\w*$', ' ', text)  # Remove words with numbers
-    return text
+    return normalizer.clean(text)
 
 
 # Write your function to Lemmatize the texts
-stopwords = nlp.Defaults.stop_words
+stopwords = lemmatizer.stopwords
+
+
+# Lemmatize the texts and extract the POS tags only for NN in a single spaCy pass
+def lemmatize_and_extract_nouns(texts):
+    return lemmatizer.lemmatize_and_tag(texts)
 
 
-def lemmatization(texts):
-    lemma_sentences = []
-    for doc in tqdm(nlp.pipe(texts)):
-        sent = [token.lemma_ for token in doc if token.text not in set(stopwords)]
-        lemma_sentences.append(' '.join(sent))
-    return lemma_sentences
+# Clean, lemmatize and POS tag a list of raw complaints
+def preprocess_texts(texts):
+    # Clean text columns
+    with profiler.stage('cleaning', rows=len(texts)):
+        cleaned = normalizer.transform(texts)
 
+    # lemmitize the text columns and keep the NN lemmas, the -PRON- and xxxx masks are removed from Complaint_clean
+    with profiler.stage('lemmatization_pos', rows=len(texts)):
+        lemmatized, pos_removed, complaint_clean = lemmatize_and_extract_nouns(cleaned)
+    return list(zip(cleaned, lemmatized, pos_removed, complaint_clean))
 
-# Create a dataframe('df_clean') that will have only the complaints and the lemmatized complaints
-df_clean = pd.DataFrame()
 
-# Clean text columns
-df_clean['complaint_what_happened'] = df['complaint_what_happened'].progress_apply(lambda x: clean_text(x))
+# On-disk cache of the preprocessed complaints, repeat runs only process new or changed complaints
+cache_path = '../../Dataset/preprocessing_cache.sqlite'
+preprocessing_config = dict(lemmatizer.config(), clean_rules=normalizer.rules or CLEAN_RULES)
+preprocessing_cache = PreprocessingCache(cache_path, preprocessing_config)
 
-# lemmitize the text columns
-df_clean['complaint_what_happened_lemmatized'] = lemmatization(df_clean['complaint_what_happened'])
 
-# adding category and sub_category columns to the dataframe for better topic identification
-df_clean['category'] = df['product']
-df_clean['sub_category'] = df['sub_product']
+# Create a dataframe('df_clean') with the complaints, the lemmatized complaints and the POS tags of one chunk
+def preprocess_chunk(chunk):
+    chunk_clean = pd.DataFrame(index=chunk.index)
 
+    cleaned, lemmatized, pos_removed, complaint_clean = preprocessing_cache.preprocess(
+        chunk['complaint_what_happened'], preprocess_texts)
+    chunk_clean['complaint_what_happened'] = cleaned
+    chunk_clean['complaint_what_happened_lemmatized'] = lemmatized
 
-# Write your function to extract the POS tags only for NN
-def extract_pos_tags(texts):
-    pos_sentences = []
-    for doc in tqdm(nlp.pipe(texts)):
-        sent = [token.text for token in doc if token.tag_ == 'NN']
-        pos_sentences.append(' '.join(sent))
-    return pos_sentences
+    # adding category and sub_category columns to the dataframe for better topic identification
+    chunk_clean['category'] = chunk['product']
+    chunk_clean['sub_category'] = chunk['sub_product']
 
+    chunk_clean["complaint_POS_removed"] = pos_removed
+    chunk_clean['Complaint_clean'] = complaint_clean
+    return chunk_clean
 
-df_clean["complaint_POS_removed"] = extract_pos_tags(df_clean['complaint_what_happened_lemmatized'])
+
+# -------------------------------------------------- Data preparation -------------------------------------------------
+
+# Uni-, bi- and trigram counts of the cleaned complaints, collected chunk by chunk for the EDA
+ngram_counter = NgramCounter(ngram_range=(1, 3))
+
+# Feed the streamed chunks through the cleaning stages one after the other
+df_clean_chunks = []
+for chunk_number, chunk in enumerate(chunks):
+    if chunk_number == 0:
+        # First 5 rows and the structure of the data
+        print(tabulate(chunk.head(), headers='keys', tablefmt='pretty'))
+        print(chunk.info())
+        print("Columns are: ", chunk.columns.values)
+
+    chunk_clean = preprocess_chunk(chunk)
+    with profiler.stage('ngram_counting', rows=len(chunk_clean)):
+        ngram_counter.update(chunk_clean['Complaint_clean'])
+    df_clean_chunks.append(chunk_clean)
+
+df_clean = pd.concat(df_clean_chunks, ignore_index=True)
+del df_clean_chunks
+
+# Cluster the near-identical cleaned complaints (templated or resubmitted tickets) with MinHash/LSH,
+# with collapse_near_duplicates only the first complaint of every cluster is kept for training.
+# The n-gram counts of the EDA are collected per chunk and still include the duplicates.
+collapse_near_duplicates = False
+measure_near_duplicate_timing = False
+near_duplicate_detector = NearDuplicateDetector(threshold=0.8, num_perm=128, bands=32, shingle_size=5)
+with profiler.stage('near_duplicates', rows=len(df_clean)):
+    df_clean['near_duplicate_cluster'] = near_duplicate_detector.find_clusters(df_clean['complaint_what_happened'])
+# With measure_near_duplicate_timing a TF-IDF/SVC fit on a sample of the complaints (product as the target) is timed
+# with and without the duplicates, a benchmark only needed when deciding on collapse_near_duplicates
+svc_timing = None
+if measure_near_duplicate_timing:
+    with profiler.stage('near_duplicate_timing'):
+        svc_timing = measure_svc_training_time(df_clean['complaint_what_happened'], df_clean['category'],
+                                               df_clean['near_duplicate_cluster'])
+print_near_duplicate_report(near_duplicate_report(df_clean['near_duplicate_cluster'].values, svc_timing))
+
+if collapse_near_duplicates:
+    df_clean = df_clean.drop_duplicates(subset='near_duplicate_cluster', keep='first').reset_index(drop=True)
+
+# Throughput of the lemmatization and POS tagging over all chunks and the cache hits/misses
+lemmatizer.print_report()
+preprocessing_cache.print_report()
 
 # The clean dataframe should now contain the raw complaint,
 # lemmatized complaint and the complaint after removing POS tags.
@@ -137,55 +153,48 @@ print(tabulate(df_clean.head(), headers='keys', tablefmt='pretty'))
 # ------------------------------ Exploratory data analysis to get familiar with the data -------------------------------
 
 # Write your code here to visualise the data according to the 'Complaint' character length
-df_clean['complaint_length'] = df_clean['complaint_what_happened'].str.len()
-df_clean['complaint_what_happened_lemmatized_length'] = df_clean['complaint_what_happened_lemmatized'].str.len()
-df_clean['complaint_POS_removed_length'] = df_clean['complaint_POS_removed'].str.len()
-
-fig = go.Figure()
-fig.add_trace(go.Histogram(x=df_clean['complaint_length'], name='Complaint'))
-fig.add_trace(go.Histogram(x=df_clean['complaint_what_happened_lemmatized_length'], name='Complaint Lemmatized'))
-fig.add_trace(go.Histogram(x=df_clean['complaint_POS_removed_length'], name='Complaint POS Removed'))
-fig.update_layout(barmode='overlay', title='Complaint Character Length', xaxis_title='Character Length',
-                  yaxis_title='Count')
-fig.update_traces(opacity=0.75)
+with profiler.stage('length_histogram', rows=len(df_clean)):
+    df_clean['complaint_length'] = df_clean['complaint_what_happened'].str.len()
+    df_clean['complaint_what_happened_lemmatized_length'] = df_clean['complaint_what_happened_lemmatized'].str.len()
+    df_clean['complaint_POS_removed_length'] = df_clean['complaint_POS_removed'].str.len()
+
+    fig = go.Figure()
+    fig.add_trace(go.Histogram(x=df_clean['complaint_length'], name='Complaint'))
+    fig.add_trace(go.Histogram(x=df_clean['complaint_what_happened_lemmatized_length'], name='Complaint Lemmatized'))
+    fig.add_trace(go.Histogram(x=df_clean['complaint_POS_removed_length'], name='Complaint POS Removed'))
+    fig.update_layout(barmode='overlay', title='Complaint Character Length', xaxis_title='Character Length',
+                      yaxis_title='Count')
+    fig.update_traces(opacity=0.75)
 fig.show()
 
 # Using a word cloud find the top 40 words by frequency among all the articles after processing the text
-wordcloud = WordCloud(stopwords=stopwords, background_color='white', width=2000, height=1500, max_words=40).generate(
-    ' '.join(df_clean['complaint_POS_removed']))
+with profiler.stage('wordcloud', rows=len(df_clean)):
+    wordcloud = WordCloud(stopwords=stopwords, background_color='white', width=2000, height=1500, max_words=40).generate(
+        ' '.join(df_clean['complaint_POS_removed']))
 plt.imshow(wordcloud, interpolation='bilinear', aspect='auto')
 plt.axis("off")
 plt.show()
 
-# Removing -PRON- from the text corpus
-df_clean['Complaint_clean'] = df_clean['complaint_POS_removed'].str.replace('-PRON-', '')
-df_clean['Complaint_clean'] = df_clean['Complaint_clean'].str.replace('xxxx', '')
-
-
-# function to get the specified top n-grams
-def get_top_n_words(corpus, n=None, count=None):
-    vec = CountVectorizer(ngram_range=(n, n)).fit(corpus)
-    bag_of_words = vec.transform(corpus)
-    sum_words = bag_of_words.sum(axis=0)
-    words_freq = [(word, sum_words[0, idx]) for word, idx in vec.vocabulary_.items()]
-    words_freq = sorted(words_freq, key=lambda x: x[1], reverse=True)
-    return words_freq[:count]
+# function to get the specified top n-grams from the counts collected while streaming the chunks
+def get_top_n_words(n=None, count=None):
+    with profiler.stage('ngram_top_k'):
+        return ngram_counter.top(n, count)
 
 
 # Print the top 10 words in the unigram frequency and plot the same using a bar graph
-unigram = get_top_n_words(df_clean['Complaint_clean'], 1, 10)
+unigram = get_top_n_words(1, 10)
 for word, freq in unigram:
     print(word, freq)
 px.bar(x=[word for word, freq in unigram], y=[freq for word, freq in unigram], title='Top 10 Unigrams')
 
 # Print the top 10 words in the bigram frequency and plot the same using a bar graph
-bigram = get_top_n_words(df_clean['Complaint_clean'], 2, 10)
+bigram = get_top_n_words(2, 10)
 for word, freq in bigram:
     print(word, freq)
 px.bar(x=[word for word, freq in bigram], y=[freq for word, freq in bigram], title='Top 10 Bigrams')
 
 # Print the top 10 words in the trigram frequency and plot the same using a bar graph
-trigram = get_top_n_words(df_clean['Complaint_clean'], 3, 10)
+trigram = get_top_n_words(3, 10)
 for word, freq in trigram:
     print(word, freq)
 px.bar(x=[word for word, freq in trigram], y=[freq for word, freq in trigram], title='Top 10 Trigram')
@@ -194,3 +203,7 @@ px.bar(x=[word for word, freq in trigram], y=[freq for word, freq in trigram], t
 # All masked texts has been removed
 print(tabulate(df_clean.head(), headers='keys', tablefmt='pretty'))
 
+# Timing and memory of every stage, the JSON report is kept per run to track regressions
+profiler.print_report()
+print("Run report written to", profiler.write_report(report_dir))
+
@@ -1,43 +1,80 @@
+import json
+import os
 from Data_preprocessing import *
 from sklearn.decomposition import NMF
 from sklearn.feature_extraction.text import TfidfVectorizer
+from Online_topic_model import OnlineTopicModel
+from Topic_model_artifact import TopicModelArtifact
+from Topic_count_sweep import sweep_topic_counts, print_sweep_report
 
 
-# -------------------------------------------- Feature Extraction -----------------------------------------------------
+# 'batch' refits the TF-IDF matrix and NMF on all complaints, 'online' updates a persisted
+# mini-batch NMF with the complaints not seen by the previous run only
+topic_model_mode = 'batch'
+topic_model_dir = '../../Models/Topic-Model'
 
-# Write your code here to initialise the TfidfVectorizer
-tf_idf_vec = TfidfVectorizer(max_df=0.98,min_df=2,stop_words='english')
+# Load your nmf_model with the n_components i.e 5
+num_topics = 5
 
-# Write your code here to create the Document Term Matrix by transforming the complaints column present in df_clean.
-tfidf = tf_idf_vec.fit_transform(df_clean['Complaint_clean'])
+# Sweep mode to choose num_topics: NMF is fitted for every count of the range in parallel worker processes
+# sharing one memory-mapped TF-IDF matrix, with the UMass coherence, reconstruction error and time of each fit.
+# The range is fitted as 2 warm-started chains (3-6 and 7-10), the same on every machine.
+run_topic_count_sweep = False
+topic_count_range = range(3, 11)
 
+if run_topic_count_sweep:
+    sweep_vec = TfidfVectorizer(max_df=0.98, min_df=2, stop_words='english')
+    sweep_results = sweep_topic_counts(sweep_vec.fit_transform(df_clean['Complaint_clean']), topic_count_range,
+                                       os.path.join(topic_model_dir, 'sweep_matrix'), n_chains=2, random_state=40)
+    print_sweep_report(sweep_results)
+    with open(os.path.join(report_dir, 'topic_count_sweep.json'), 'w') as f:
+        json.dump(sweep_results, f, indent=2)
 
-# ------------------------------ Topic Modelling using NMF / Manual Topic Modeling -------------------------------------
+if topic_model_mode == 'online':
+    # --------------------------------- Streaming Topic Modelling using mini-batch NMF ---------------------------------
 
-# Load your nmf_model with the n_components i.e 5
-num_topics = 5
+    # The vocabulary and the topic order are fixed by the first run, later runs keep the same topic numbers
+    online_model = OnlineTopicModel(topic_model_dir, n_components=num_topics, random_state=40)
+    online_model.load()
+    new_complaints = online_model.update(df_clean['Complaint_clean'])
+    online_model.save()
+    print(f"Topic model updated with {new_complaints} new complaints")
+
+    tf_idf_vec = online_model.tf_idf_vec
+    nmf_model = online_model.nmf_model
+    tfidf = tf_idf_vec.transform(df_clean['Complaint_clean'])
+
+else:
+    # -------------------------------------------- Feature Extraction -------------------------------------------------
+
+    # Write your code here to initialise the TfidfVectorizer
+    tf_idf_vec = TfidfVectorizer(max_df=0.98,min_df=2,stop_words='english')
+
+    # Write your code here to create the Document Term Matrix by transforming the complaints column present in df_clean.
+    tfidf = tf_idf_vec.fit_transform(df_clean['Complaint_clean'])
 
-# Keep the random_state =40
-nmf_model = NMF(n_components=num_topics, random_state=40)
 
-nmf_model.fit(tfidf)
-print(len(tf_idf_vec.get_feature_names_out()))
+    # -------------------------- Topic Modelling using NMF / Manual Topic Modeling ---------------------------------
+
+    # Keep the random_state =40
+    nmf_model = NMF(n_components=num_topics, random_state=40)
+
+    nmf_model.fit(tfidf)
+
+# Keep the fitted vectorizer and NMF model with the top 15 terms of every topic precomputed
+topic_model = TopicModelArtifact(tf_idf_vec, nmf_model, top_k=15)
+print(len(topic_model.feature_names))
 
 
 # Print the Top15 words for each of the topics
-for index, topic in enumerate(nmf_model.components_):
+for index in range(topic_model.n_topics):
     print(f'THE TOP 15 WORDS FOR TOPIC #{index} with tf-idf score')
-    print([tf_idf_vec.get_feature_names_out()[i] for i in topic.argsort()[-15:]])
+    print(topic_model.top_terms(index))
     print('\n')
 
 
-# Create the best topic for each complaint in terms of integer value 0,1,2,3 & 4
-topic_values = nmf_model.transform(tfidf)
-topic_values.argmax(axis=1)
-
-
-# Assign the best topic to each of the cmplaints in Topic Column
-df_clean['Topic'] = topic_values.argmax(axis=1)
+# Assign the best topic (integer value 0,1,2,3 & 4) to each of the cmplaints in Topic Column
+df_clean['Topic'] = topic_model.assign_features(tfidf)
 
 
 print(tabulate(df_clean.head(), headers='keys', tablefmt='pretty'))
@@ -59,6 +96,10 @@ Topic_names = {
 # Replace Topics with Topic Names
 df_clean['Topic_category'] = df_clean['Topic'].map(Topic_names)
 
+# Save the topic model artifact, new tickets are assigned with TopicModelArtifact.load(...).assign_names(texts)
+topic_model.topic_names = Topic_names
+topic_model.save(os.path.join(topic_model_dir, 'topic_model_artifact.pkl'))
+
 print(tabulate(df_clean.head(), headers='keys', tablefmt='pretty'))
 
 # Specify the file path where you want to save the modified DataFrame as a CSV file
@@ -66,4 +107,3 @@ output_file = '../../Dataset/Cleaned_Dataset.csv'
 
 # Save the modified DataFrame to a CSV file
 df_clean.to_csv(output_file, index=False)
-
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import time
+import spacy
+from tqdm import tqdm
+
+
+# Multi-process spaCy lemmatizer that keeps only the pipeline components needed for lemmas
+class LemmatizationEngine:
+    def __init__(self, model_name='en_core_web_sm', batch_size=1000, n_process=-1, disable=('parser', 'ner')):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.n_process = os.cpu_count() if n_process == -1 else n_process
+        # The spaCy workers are forked: with spawn (the default on macOS) every worker would import the calling
+        # script again and run its module-level preprocessing. Without fork the texts are parsed in this process.
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.n_process = 1
+        self.disable = list(disable)
+
+        # The rule based lemmatizer needs the tagger and attribute_ruler, parser and NER are never used
+        self.nlp = spacy.load(model_name, disable=self.disable)
+
+        # Stopwords are looked up for every token, so build the set only once
+        self.stopwords = frozenset(self.nlp.Defaults.stop_words)
+
+        self.report = {}
+
+    # nlp.pipe with the workers started by fork, spaCy takes them from the default start method which is restored
+    # once the texts are consumed
+    def _pipe(self, texts):
+        if self.n_process == 1:
+            yield from self.nlp.pipe(texts, batch_size=self.batch_size, n_process=1)
+            return
+        start_method = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method('fork', force=True)
+        try:
+            yield from self.nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process)
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+
+    # Lemmatize the texts and drop the stopwords
+    def lemmatize(self, texts):
+        texts = list(texts)
+        lemma_sentences = []
+        n_tokens = 0
+
+        start_time = time.perf_counter()
+        for doc in tqdm(self._pipe(texts), total=len(texts)):
+            n_tokens += len(doc)
+            sent = [token.lemma_ for token in doc if token.text not in self.stopwords]
+            lemma_sentences.append(' '.join(sent))
+        elapsed = time.perf_counter() - start_time
+
+        self._update_report(len(texts), n_tokens, elapsed)
+        return lemma_sentences
+
+    # Parse every text once and emit the lemmatized text, the NN lemmas and the cleaned NN lemmas together
+    def lemmatize_and_tag(self, texts):
+        texts = list(texts)
+        lemma_sentences = []
+        pos_sentences = []
+        clean_sentences = []
+        n_tokens = 0
+
+        start_time = time.perf_counter()
+        for doc in tqdm(self._pipe(texts), total=len(texts)):
+            n_tokens += len(doc)
+            lemmas = []
+            nouns = []
+            for token in doc:
+                if token.text in self.stopwords:
+                    continue
+                lemmas.append(token.lemma_)
+                if token.tag_ == 'NN':
+                    nouns.append(token.lemma_)
+            pos_sentence = ' '.join(nouns)
+            lemma_sentences.append(' '.join(lemmas))
+            pos_sentences.append(pos_sentence)
+            clean_sentences.append(pos_sentence.replace('-PRON-', '').replace('xxxx', ''))
+        elapsed = time.perf_counter() - start_time
+
+        self._update_report(len(texts), n_tokens, elapsed)
+        return lemma_sentences, pos_sentences, clean_sentences
+
+    # Settings that change the lemmas and POS tags, used to key cached results
+    def config(self):
+        return {
+            'spacy_version': spacy.__version__,
+            'model': f"{self.nlp.meta.get('lang')}_{self.nlp.meta.get('name')}",
+            'model_version': self.nlp.meta.get('version'),
+            'disable': sorted(self.disable),
+            'stopwords': sorted(self.stopwords)
+        }
+
+    # Accumulate the throughput over all calls, e.g. over the chunks of a streamed dataset
+    def _update_report(self, n_docs, n_tokens, elapsed):
+        docs = self.report.get('docs', 0) + n_docs
+        tokens = self.report.get('tokens', 0) + n_tokens
+        seconds = self.report.get('seconds', 0.0) + elapsed
+        self.report = {
+            'model': self.model_name,
+            'n_process': self.n_process,
+            'batch_size': self.batch_size,
+            'docs': docs,
+            'tokens': tokens,
+            'seconds': seconds,
+            'docs_per_sec': docs / seconds if seconds > 0 else 0.0,
+            'tokens_per_sec': tokens / seconds if seconds > 0 else 0.0
+        }
+
+    # Print the throughput report to size the preprocessing jobs
+    def print_report(self):
+        if not self.report:
+            print("Lemmatization report: no documents processed")
+            return
+        print(f"Lemmatization report ({self.report['model']}, {self.report['n_process']} processes, "
+              f"batch size {self.report['batch_size']}):")
+        print(f"  {self.report['docs']} docs, {self.report['tokens']} tokens in {self.report['seconds']:.2f} seconds")
+        print(f"  {self.report['docs_per_sec']:.1f} docs/sec, {self.report['tokens_per_sec']:.1f} tokens/sec")
@@ -0,0 +1,133 @@
+import time
+import zlib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import SVC
+from tqdm import tqdm
+
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+# Hashes of the word k-shingles of a text, short texts are a single shingle
+def shingle_hashes(text, shingle_size=5):
+    tokens = text.split()
+    if len(tokens) <= shingle_size:
+        grams = {' '.join(tokens)}
+    else:
+        grams = {' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+# MinHash signatures with LSH banding to cluster near-identical complaints in roughly linear time
+class NearDuplicateDetector:
+    def __init__(self, threshold=0.8, num_perm=128, bands=32, shingle_size=5, random_state=1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+
+        # Random universal hash functions (a * x + b) mod p, one per permutation
+        generator = np.random.RandomState(random_state)
+        self.a = generator.randint(1, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        texts = list(texts)
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(tqdm(texts)):
+            hashes = shingle_hashes(text, self.shingle_size)
+            permuted = ((hashes[:, None] * self.a + self.b) % MERSENNE_PRIME) & MAX_HASH
+            signatures[i] = permuted.min(axis=0)
+        return signatures
+
+    # Cluster label per text, the label is the position of the first text of its cluster
+    def find_clusters(self, texts):
+        signatures = self.signatures(texts)
+        n_docs = len(signatures)
+        rows = self.num_perm // self.bands
+        parent = np.arange(n_docs)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            band_values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+            buckets = {}
+            for i in range(n_docs):
+                buckets.setdefault(band_values[i].tobytes(), []).append(i)
+
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                # Compare every member with the first one only, candidates are confirmed on the full signature
+                first = members[0]
+                similarity = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+                for other, score in zip(members[1:], similarity):
+                    if score >= self.threshold:
+                        root_first, root_other = find(first), find(other)
+                        if root_first != root_other:
+                            parent[max(root_first, root_other)] = min(root_first, root_other)
+
+        return np.array([find(i) for i in range(n_docs)])
+
+
+# Shrink of the corpus and the expected change of the training time of the two model families.
+# The kernel SVC on TF-IDF features scales roughly quadratically with the samples, BERT fine-tuning linearly.
+# Measured TF-IDF/SVC training time before and after collapsing, on the same random sample of the corpus:
+# the whole sample, then only the first complaint of every cluster in it
+def measure_svc_training_time(texts, targets, labels, sample_size=5000, random_state=1):
+    texts, targets, labels = np.asarray(texts, dtype=object), np.asarray(targets), np.asarray(labels)
+    rng = np.random.RandomState(random_state)
+    sample = np.sort(rng.choice(len(texts), size=min(sample_size, len(texts)), replace=False))
+    _, first = np.unique(labels[sample], return_index=True)
+    collapsed = sample[np.sort(first)]
+
+    timing = {}
+    for name, rows in (('before', sample), ('after', collapsed)):
+        start = time.perf_counter()
+        features = TfidfVectorizer().fit_transform(texts[rows])
+        SVC().fit(features, targets[rows])
+        timing[f'svc_rows_{name}'] = len(rows)
+        timing[f'svc_seconds_{name}'] = time.perf_counter() - start
+    timing['svc_training_time_pct'] = timing['svc_seconds_after'] / timing['svc_seconds_before'] * 100
+    return timing
+
+
+# Shrink of the corpus, with svc_timing (measure_svc_training_time) the measured SVC training time.
+# The BERT time is an estimate: an epoch runs a fixed number of steps per row, so it shrinks with the rows.
+def near_duplicate_report(labels, svc_timing=None):
+    n_rows = len(labels)
+    n_kept = len(np.unique(labels))
+    cluster_sizes = np.bincount(labels)
+    ratio = n_kept / n_rows if n_rows else 1.0
+    report = {
+        'rows_before': n_rows,
+        'rows_after': n_kept,
+        'removed_rows': n_rows - n_kept,
+        'shrink_pct': (1 - ratio) * 100,
+        'duplicate_clusters': int((cluster_sizes > 1).sum()),
+        'largest_cluster': int(cluster_sizes.max()) if n_rows else 0,
+        'estimated_bert_training_time_pct': ratio * 100
+    }
+    if svc_timing is not None:
+        report.update(svc_timing)
+    return report
+
+
+def print_near_duplicate_report(report):
+    print(f"Near-duplicates: {report['duplicate_clusters']} clusters, largest has {report['largest_cluster']} complaints")
+    print(f"  Corpus {report['rows_before']} -> {report['rows_after']} complaints "
+          f"({report['removed_rows']} removed, {report['shrink_pct']:.1f}% smaller)")
+    if 'svc_training_time_pct' in report:
+        print(f"  Measured TF-IDF/SVC training time on a sample: {report['svc_seconds_before']:.1f}s for "
+              f"{report['svc_rows_before']} rows -> {report['svc_seconds_after']:.1f}s for {report['svc_rows_after']} "
+              f"rows ({report['svc_training_time_pct']:.1f}% of the current time)")
+    print(f"  Estimated BERT epoch time after collapsing (linear in the rows, not measured): "
+          f"{report['estimated_bert_training_time_pct']:.1f}% of the current time")
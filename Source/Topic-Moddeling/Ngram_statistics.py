@@ -0,0 +1,38 @@
+import heapq
+import re
+from collections import Counter
+from operator import itemgetter
+
+
+# Same tokens as the default CountVectorizer: lower case words of at least two characters
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+# Counts all n-grams of the range in one pass over the corpus, chunk by chunk
+class NgramCounter:
+    def __init__(self, ngram_range=(1, 3)):
+        self.ngram_range = ngram_range
+        self.counts = {n: Counter() for n in range(ngram_range[0], ngram_range[1] + 1)}
+        self.n_docs = 0
+
+    # Add the n-grams of a chunk of texts
+    def update(self, texts):
+        for text in texts:
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            for n, counts in self.counts.items():
+                # The n-grams are kept as tuples, they are only joined for the top-k results
+                counts.update(zip(*[tokens[i:] for i in range(n)]))
+            self.n_docs += 1
+        return self
+
+    # Merge the counts of another counter, e.g. one built on another chunk or in another process
+    def merge(self, other):
+        for n, counts in other.counts.items():
+            self.counts.setdefault(n, Counter()).update(counts)
+        self.n_docs += other.n_docs
+        return self
+
+    # Top-k n-grams of size n with their frequency, selected with a heap instead of a full sort
+    def top(self, n, k=10):
+        ngrams = heapq.nlargest(k, self.counts[n].items(), key=itemgetter(1))
+        return [(' '.join(gram), count) for gram, count in ngrams]
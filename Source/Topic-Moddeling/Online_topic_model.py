@@ -0,0 +1,92 @@
+import hashlib
+import os
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+try:
+    from sklearn.decomposition import MiniBatchNMF
+except ImportError:  # MiniBatchNMF was added in scikit-learn 1.1
+    MiniBatchNMF = None
+
+
+# Same vectorizer settings as the full-batch topic model of Feature_extraction.py
+TFIDF_PARAMS = {'max_df': 0.98, 'min_df': 2, 'stop_words': 'english'}
+
+
+# Stable 64 bit fingerprint of every complaint, used to recognise the complaints already seen by the model
+def complaint_digests(texts):
+    return np.fromiter((int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+                        for text in texts), dtype=np.uint64)
+
+
+def _atomic_dump(obj, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Streaming NMF topic model: the TF-IDF vocabulary is fixed by the first fit, the topics are then
+# updated chunk by chunk with MiniBatchNMF.partial_fit. The vectorizer, the model and the fingerprints
+# of the complaints already learned from are persisted, so a nightly run only processes the new complaints.
+class OnlineTopicModel:
+    def __init__(self, model_dir, n_components=5, batch_size=2048, random_state=40, tfidf_params=None):
+        if MiniBatchNMF is None:
+            raise ImportError("The online topic model needs MiniBatchNMF, install scikit-learn>=1.1")
+        self.model_dir = model_dir
+        self.n_components = n_components
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.tfidf_params = tfidf_params or TFIDF_PARAMS
+
+        self.tf_idf_vec = None
+        self.nmf_model = None
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def _path(self, name):
+        return os.path.join(self.model_dir, name)
+
+    # Load the persisted state, returns False when there is none yet
+    def load(self):
+        if not os.path.exists(self._path('nmf_model.pkl')):
+            return False
+        self.tf_idf_vec = joblib.load(self._path('tf_idf_vec.pkl'))
+        self.nmf_model = joblib.load(self._path('nmf_model.pkl'))
+        self.seen = np.load(self._path('seen_complaints.npy'))
+        return True
+
+    # The model is written last, load() only picks up a complete state
+    def save(self):
+        os.makedirs(self.model_dir, exist_ok=True)
+        _atomic_dump(self.tf_idf_vec, self._path('tf_idf_vec.pkl'))
+        tmp_path = self._path(f'seen_complaints.{os.getpid()}.tmp.npy')
+        np.save(tmp_path, self.seen)
+        os.replace(tmp_path, self._path('seen_complaints.npy'))
+        _atomic_dump(self.nmf_model, self._path('nmf_model.pkl'))
+
+    # Update the topics with the complaints not seen before, returns the number of new complaints
+    def update(self, texts, chunk_size=10000):
+        texts = list(texts)
+        digests = complaint_digests(texts)
+        # Unseen complaints, a complaint repeated inside the delta is only learned from once
+        _, first = np.unique(digests, return_index=True)
+        new = np.sort(first[~np.isin(digests[first], self.seen)])
+        if len(new) == 0:
+            return 0
+        new_texts = [texts[i] for i in new]
+
+        if self.tf_idf_vec is None:
+            self.tf_idf_vec = TfidfVectorizer(**self.tfidf_params).fit(new_texts)
+        if self.nmf_model is None:
+            self.nmf_model = MiniBatchNMF(n_components=self.n_components, batch_size=self.batch_size,
+                                          random_state=self.random_state)
+
+        for start in range(0, len(new_texts), chunk_size):
+            self.nmf_model.partial_fit(self.tf_idf_vec.transform(new_texts[start:start + chunk_size]))
+
+        self.seen = np.union1d(self.seen, digests[new])
+        return len(new)
+
+    # Topic weights of the complaints, without refitting anything
+    def transform(self, texts):
+        return self.nmf_model.transform(self.tf_idf_vec.transform(texts))
@@ -0,0 +1,162 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the memory columns are then left empty
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # The current RSS is then read from /proc (Linux only)
+    psutil = None
+
+
+# High-water mark of the resident memory in MB, for this process or for its finished child processes
+def peak_rss_mb(children=False):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return usage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+
+
+# Current resident memory of this process in MB, None when it cannot be read (macOS without psutil)
+def current_rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+# Samples the current RSS in a background thread while a stage runs, the peak of the stage itself
+# (ru_maxrss is the peak of the whole process lifetime, every stage after the heaviest one would report it)
+class RssSampler:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def start(self):
+        if self.start_mb is not None:
+            self._thread.start()
+        return self
+
+    # The peak and the growth over the start of the stage, (None, None) without an RSS source
+    def stop(self):
+        if self.start_mb is None:
+            return None, None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak_mb, self.peak_mb - self.start_mb
+
+
+# CPU time of the finished child processes, e.g. the spaCy workers of nlp.pipe(n_process=...)
+def children_cpu_seconds():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Wall time, CPU time, peak RSS and rows/sec per pipeline stage, written as a JSON run report.
+# A stage can be entered several times (e.g. once per chunk), its numbers are accumulated.
+class PipelineProfiler:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.start_time = time.perf_counter()
+        self.stages = {}
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'rows': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                 'peak_rss_mb': None, 'rss_growth_mb': None, 'peak_children_rss_mb': None}
+        return self.stages[name]
+
+    # Time the block and record it under the stage name, rows processed can be given up front or via add_rows
+    @contextmanager
+    def stage(self, name, rows=0):
+        record = self._stage(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time() + children_cpu_seconds()
+        sampler = RssSampler().start()
+        try:
+            yield record
+        finally:
+            record['calls'] += 1
+            record['rows'] += rows
+            record['wall_seconds'] += time.perf_counter() - wall_start
+            record['cpu_seconds'] += time.process_time() + children_cpu_seconds() - cpu_start
+            # Peak RSS sampled during the stage and its growth over the stage, the largest over all calls
+            stage_peak, growth = sampler.stop()
+            if stage_peak is not None:
+                record['peak_rss_mb'] = max(record['peak_rss_mb'] or 0.0, stage_peak)
+                record['rss_growth_mb'] = max(record['rss_growth_mb'] or 0.0, growth)
+            # The children's ru_maxrss is the high-water mark of all finished child processes so far
+            record['peak_children_rss_mb'] = peak_rss_mb(children=True)
+
+    def add_rows(self, name, rows):
+        self._stage(name)['rows'] += rows
+
+    # Time every next() of an iterator as the stage, e.g. the chunks read from the JSON dump
+    def iterate(self, name, iterable, rows=len):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                record['rows'] += rows(item)
+            yield item
+
+    def report(self):
+        stages = {}
+        for name, record in self.stages.items():
+            stages[name] = dict(record)
+            stages[name]['rows_per_sec'] = record['rows'] / record['wall_seconds'] if record['wall_seconds'] > 0 else None
+        return {
+            'pipeline': self.name,
+            'started_at': self.started_at,
+            'total_wall_seconds': time.perf_counter() - self.start_time,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"Run report of {report['pipeline']} ({report['total_wall_seconds']:.1f} seconds):")
+        for name, record in report['stages'].items():
+            rows_per_sec = f"{record['rows_per_sec']:.1f}" if record['rows_per_sec'] is not None else '-'
+            peak_rss = f"{record['peak_rss_mb']:.0f}" if record['peak_rss_mb'] is not None else '-'
+            growth = f"{record['rss_growth_mb']:+.0f}" if record['rss_growth_mb'] is not None else '-'
+            print(f"  {name:<22} wall {record['wall_seconds']:8.2f}s  cpu {record['cpu_seconds']:8.2f}s  "
+                  f"peak rss {peak_rss:>6} MB ({growth:>6} MB)  {record['rows']:>9} rows  {rows_per_sec:>10} rows/sec")
+
+    # Write the machine-readable report, one file per run so runs can be compared
+    def write_report(self, report_dir):
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{self.name}_{self.started_at.replace(':', '-')}.json")
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import sqlite3
+
+
+# Persistent cache of preprocessed complaints keyed by the raw text and the preprocessing config
+class PreprocessingCache:
+    columns = ['cleaned', 'lemmatized', 'pos_removed', 'complaint_clean']
+
+    def __init__(self, path, config, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+
+        # Any change in the spaCy model, the stopwords or the regexes gives new keys for every complaint
+        self.config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS complaints (key TEXT PRIMARY KEY, '
+            + ', '.join(f'{column} TEXT' for column in self.columns) + ')'
+        )
+        self.conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    # Content address of one raw complaint under the current config
+    def key(self, text):
+        return hashlib.sha256((self.config_hash + '\0' + text).encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        for i in range(0, len(keys), self.batch_size):
+            batch = keys[i:i + self.batch_size]
+            placeholders = ', '.join('?' * len(batch))
+            rows = self.conn.execute(
+                f'SELECT key, {", ".join(self.columns)} FROM complaints WHERE key IN ({placeholders})', batch
+            )
+            for row in rows:
+                found[row[0]] = row[1:]
+        return found
+
+    def _store(self, rows):
+        placeholders = ', '.join('?' * (len(self.columns) + 1))
+        self.conn.executemany(f'INSERT OR REPLACE INTO complaints VALUES ({placeholders})', rows)
+        self.conn.commit()
+
+    # Return the preprocessed columns for the raw texts, only new or changed texts go through process_fn.
+    # process_fn maps a list of raw texts to a list of (cleaned, lemmatized, pos_removed, complaint_clean) tuples
+    def preprocess(self, texts, process_fn):
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+
+        # Process every missing complaint once, even if it appears several times in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            results = process_fn(list(missing.values()))
+            new_rows = {key: tuple(result) for key, result in zip(missing.keys(), results)}
+            self._store([(key,) + values for key, values in new_rows.items()])
+            found.update(new_rows)
+
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        values = [found[key] for key in keys]
+        return tuple([row[i] for row in values] for i in range(len(self.columns)))
+
+    # Print how many complaints were served from the cache
+    def print_report(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        print(f"Preprocessing cache ({self.path}): {self.hits} hits, {self.misses} misses, {hit_rate:.1f}% hit rate")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,158 @@
+import os
+import re
+import sys
+import time
+import joblib
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+# Rules of the thesis clean_text, applied in this order after lower casing.
+# 'document' rules are regexes applied to every complaint on its own (they are anchored to the whole text),
+# 'character' rules are single character classes, replaced in one str.translate pass over all ASCII complaints.
+CLEAN_RULES = [
+    ('document', r'^\[[\w\s]\]+$', ' '),  # Remove text in square brackets
+    ('character', r'[^\w\s]', ' '),  # Remove punctuation
+    ('document', r'^[a-zA-Z]\d+\w*$', ' ')  # Remove words with numbers
+]
+
+# Joins the ASCII complaints for the translate pass, it is whitespace so the character rules never touch it
+SEPARATOR = '\x1e'
+
+
+# str.isascii needs Python 3.7, the pinned environment runs 3.6
+def _is_ascii(doc):
+    try:
+        doc.encode('ascii')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+# Text normalization with precompiled rules, shared by the preprocessing and the online classification
+class TextNormalizer(BaseEstimator, TransformerMixin):
+    def __init__(self, rules=None, lowercase=True):
+        self.rules = rules
+        self.lowercase = lowercase
+
+    def _compile(self):
+        rules = CLEAN_RULES if self.rules is None else self.rules
+        compiled = []
+        for kind, pattern, replacement in rules:
+            if kind not in ('document', 'character'):
+                raise ValueError(f"Unknown rule kind '{kind}', expected 'document' or 'character'")
+            regex = re.compile(pattern)
+            table = None
+            if kind == 'character':
+                if regex.match(SEPARATOR):
+                    raise ValueError(f"Character rule '{pattern}' would remove the complaint separator")
+                # Translation table of the rule over the ASCII characters
+                table = {code: replacement for code in range(128) if regex.fullmatch(chr(code))}
+            compiled.append((kind, regex, replacement, table))
+        self._compiled = compiled
+
+    def fit(self, X=None, y=None):
+        return self
+
+    # Clean a whole Series or list of complaints in one call
+    def transform(self, X, y=None):
+        if getattr(self, '_compiled', None) is None:
+            self._compile()
+
+        docs = list(X)
+        if self.lowercase:
+            docs = [doc.lower() for doc in docs]
+
+        # ASCII complaints go through the translate fast path, the others through the regex
+        fast = [i for i, doc in enumerate(docs) if _is_ascii(doc) and SEPARATOR not in doc]
+        fast_set = set(fast)
+        slow = [i for i in range(len(docs)) if i not in fast_set]
+
+        for kind, regex, replacement, table in self._compiled:
+            if kind == 'document':
+                docs = [regex.sub(replacement, doc) for doc in docs]
+                continue
+            if fast:
+                translated = SEPARATOR.join([docs[i] for i in fast]).translate(table).split(SEPARATOR)
+                for i, doc in zip(fast, translated):
+                    docs[i] = doc
+            for i in slow:
+                docs[i] = regex.sub(replacement, docs[i])
+
+        if isinstance(X, pd.Series):
+            return pd.Series(docs, index=X.index, name=X.name, dtype=object)
+        return docs
+
+    # Fast path for a single ticket
+    def clean(self, text):
+        return self.transform([text])[0]
+
+    # The compiled rules are rebuilt after loading, only the rules are stored next to the model
+    def __getstate__(self):
+        state = dict(super().__getstate__())
+        state.pop('_compiled', None)
+        return state
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+    # The normalizer saved next to a model, or the default rules when none was saved: the normalizer has no fitted
+    # state, deployments from before it was persisted clean the tickets with the default rules like the training data
+    @staticmethod
+    def load_or_default(path):
+        if os.path.exists(path):
+            return TextNormalizer.load(path)
+        return TextNormalizer()
+
+
+# The previous row by row clean_text, kept as the baseline of the benchmark
+def apply_clean_text(texts):
+    def clean_text(text):
+        text = text.lower()  # Convert to lower case
+        text = re.sub(r'^\[[\w\s]\]+$', ' ', text)  # Remove text in square brackets
+        text = re.sub(r'[^\w\s]', ' ', text)  # Remove punctuation
+        text = re.sub(r'^[a-zA-Z]\d+\w*$', ' ', text)  # Remove words with numbers
+        return text
+    return pd.Series(texts).apply(clean_text)
+
+
+# Compare the vectorized normalizer against the apply based clean_text on the same complaints
+def benchmark(texts, repeat=3):
+    texts = pd.Series(list(texts))
+    normalizer = TextNormalizer()
+
+    apply_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        expected = apply_clean_text(texts)
+        apply_times.append(time.perf_counter() - start_time)
+
+    normalizer_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = normalizer.transform(texts)
+        normalizer_times.append(time.perf_counter() - start_time)
+
+    print(f"Benchmark on {len(texts)} complaints (best of {repeat}):")
+    print(f"  apply clean_text: {min(apply_times):.3f} seconds")
+    print(f"  TextNormalizer:   {min(normalizer_times):.3f} seconds ({min(apply_times) / min(normalizer_times):.1f}x)")
+    print(f"  Identical output: {result.tolist() == expected.tolist()}")
+
+
+if __name__ == '__main__':
+    from Data_loading import stream_complaints
+
+    # Usage: python Text_normalizer.py [complaints json] [number of complaints]
+    data_path = sys.argv[1] if len(sys.argv) > 1 else '../../Dataset/complaints-2021-05-14_08_16.json'
+    n_complaints = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    complaints = []
+    for chunk in stream_complaints(data_path, chunk_size=10000):
+        complaints.extend(chunk['complaint_what_happened'])
+        if len(complaints) >= n_complaints:
+            break
+    benchmark(complaints[:n_complaints])
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.decomposition import NMF
+from tabulate import tabulate
+from Topic_model_artifact import top_k_indices
+
+# The memory-mapped CSR helpers live in the Ticket-Classification directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Ticket-Classification'))
+from Search_common import load_csr, save_csr
+
+
+# UMass coherence of every topic over its top terms, from the document co-occurrence of the terms.
+# Closer to 0 is more coherent.
+def umass_coherence(matrix, components, top_n=10):
+    scores = []
+    for terms in top_k_indices(components, top_n):
+        occurrence = (matrix[:, terms] > 0).astype(np.float64)
+        co_occurrence = (occurrence.T @ occurrence).toarray()
+        doc_frequency = np.diag(co_occurrence)
+        # Pairs (i, j) with j ranked above i, the term of higher rank is the conditioning one
+        i, j = np.tril_indices(len(terms), k=-1)
+        scores.append(np.log((co_occurrence[i, j] + 1) / np.maximum(doc_frequency[j], 1)).mean())
+    return np.array(scores)
+
+
+# Add components to a solution of k topics so it can initialise the fit with more topics,
+# the new components are scaled like the random initialisation of NMF
+def _extend_solution(W, H, matrix, n_components, random_state):
+    extra = n_components - W.shape[1]
+    generator = np.random.RandomState(random_state)
+    scale = np.sqrt(matrix.mean() / n_components)
+    W = np.hstack([W, scale * np.abs(generator.standard_normal((W.shape[0], extra)))])
+    H = np.vstack([H, scale * np.abs(generator.standard_normal((extra, H.shape[1])))])
+    return W, H
+
+
+# Fit a chain of increasing topic counts in one worker, every fit starts from the solution of the previous one
+def _fit_chain(matrix_dir, topic_counts, random_state, max_iter, coherence_top_n):
+    matrix = load_csr(matrix_dir)
+    results = []
+    W = H = None
+    for n_components in topic_counts:
+        start = time.perf_counter()
+        if W is None:
+            model = NMF(n_components=n_components, random_state=random_state, max_iter=max_iter)
+            W = model.fit_transform(matrix)
+        else:
+            W, H = _extend_solution(W, H, matrix, n_components, random_state)
+            model = NMF(n_components=n_components, init='custom', random_state=random_state, max_iter=max_iter)
+            W = model.fit_transform(matrix, W=W, H=H)
+        H = model.components_
+        seconds = time.perf_counter() - start
+
+        coherence = umass_coherence(matrix, H, coherence_top_n)
+        results.append({
+            'n_components': n_components,
+            'warm_start': len(results) > 0,
+            'coherence': float(coherence.mean()),
+            'coherence_per_topic': coherence.tolist(),
+            'reconstruction_err': float(model.reconstruction_err_),
+            'n_iter': int(model.n_iter_),
+            'seconds': seconds,
+            'worker_pid': os.getpid()
+        })
+    return results
+
+
+# Fit NMF for every topic count in parallel worker processes sharing one memory-mapped matrix.
+# The sorted counts are split into n_chains contiguous chains, e.g. 3-6 and 7-10 for range(3, 11) with 2 chains.
+# Within a chain the counts are fitted in increasing order, the first one from the random initialisation and every
+# next one warm-started from the solution of the previous one. The chains do not depend on the number of cores, so
+# the results are the same on every machine; n_workers (default: the cores) only sets how many chains run at once.
+def sweep_topic_counts(matrix, topic_counts, matrix_dir, n_chains=2, n_workers=None, random_state=40, max_iter=200,
+                       coherence_top_n=10):
+    topic_counts = sorted(topic_counts)
+    chains = [list(chain) for chain in np.array_split(topic_counts, min(n_chains, len(topic_counts))) if len(chain)]
+    n_workers = min(n_workers or os.cpu_count(), len(chains))
+    save_csr(matrix, matrix_dir)
+
+    # Forked workers, spawned ones would re-run the module-level preprocessing of the calling script
+    mp_context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        futures = [executor.submit(_fit_chain, matrix_dir, [int(k) for k in chain], random_state, max_iter,
+                                   coherence_top_n) for chain in chains]
+        results = [dict(result, chain=index) for index, future in enumerate(futures) for result in future.result()]
+    return sorted(results, key=lambda result: result['n_components'])
+
+
+def print_sweep_report(results):
+    rows = [[result['n_components'], result['chain'], 'yes' if result['warm_start'] else 'no', f"{result['coherence']:.4f}",
+             f"{result['reconstruction_err']:.4f}", result['n_iter'], f"{result['seconds']:.2f}"] for result in results]
+    print(tabulate(rows, headers=['Topics', 'Chain', 'Warm start', 'UMass coherence', 'Reconstruction error', 'Iterations',
+                                  'Seconds'], tablefmt='pretty'))
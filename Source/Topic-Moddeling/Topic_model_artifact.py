@@ -0,0 +1,65 @@
+import os
+import joblib
+import numpy as np
+
+
+# Indices of the k largest weights of every row, ordered by decreasing weight.
+# argpartition selects the k terms in linear time, only those k are sorted.
+def top_k_indices(components, k):
+    k = min(k, components.shape[1])
+    top = np.argpartition(-components, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(components, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+# The fitted TF-IDF vectorizer and NMF model with a precomputed top-k term index per topic,
+# saved as one file so topics can be looked up and new tickets assigned without refitting
+class TopicModelArtifact:
+    def __init__(self, tf_idf_vec, nmf_model, topic_names=None, top_k=15):
+        self.tf_idf_vec = tf_idf_vec
+        self.nmf_model = nmf_model
+        self.topic_names = dict(topic_names or {})
+        self.feature_names = tf_idf_vec.get_feature_names_out()
+        self.top_term_index = top_k_indices(nmf_model.components_, top_k)
+        self.top_term_weights = np.take_along_axis(nmf_model.components_, self.top_term_index, axis=1)
+
+    @property
+    def n_topics(self):
+        return self.top_term_index.shape[0]
+
+    # Top terms of a topic, served from the precomputed index
+    def top_terms(self, topic, k=None):
+        return list(self.feature_names[self.top_term_index[topic, :k]])
+
+    def top_terms_with_weights(self, topic, k=None):
+        return list(zip(self.top_terms(topic, k), self.top_term_weights[topic, :k]))
+
+    # Best topic of every row of an already vectorized document-term matrix
+    def assign_features(self, features, batch_size=10000):
+        topics = np.empty(features.shape[0], dtype=np.int64)
+        for start in range(0, features.shape[0], batch_size):
+            topics[start:start + batch_size] = self.nmf_model.transform(features[start:start + batch_size]).argmax(axis=1)
+        return topics
+
+    # Best topic of every text, vectorized and transformed batch by batch
+    def assign(self, texts, batch_size=10000):
+        texts = list(texts)
+        topics = np.empty(len(texts), dtype=np.int64)
+        for start in range(0, len(texts), batch_size):
+            features = self.tf_idf_vec.transform(texts[start:start + batch_size])
+            topics[start:start + batch_size] = self.nmf_model.transform(features).argmax(axis=1)
+        return topics
+
+    # Topic names of the texts, the topic number is kept when it has no name
+    def assign_names(self, texts, batch_size=10000):
+        return [self.topic_names.get(int(topic), int(topic)) for topic in self.assign(texts, batch_size)]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
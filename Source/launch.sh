@@ -7,6 +7,8 @@
 #SBATCH -t 180
 #SBATCH -N 1                  
 #SBATCH --export=ALL
+#SBATCH --requeue
+#SBATCH --signal=B:USR1@300
 
 
 print_error_and_exit() { echo "***ERROR*** $*"; exit 1; }
@@ -18,6 +20,10 @@ module load lang/Python
 # Activate the virtual environment
 source /home/users/elicina/.virtualenvs/Master-Thesis/bin/activate || print_error_and_exit "Failed to activate virtual environment"
  
-# Run your Python script
-python /home/users/elicina/Master-Thesis/Source/Ticket-Classification/ML-models/Test.py || print_error_and_exit "Python script execution failed"
+# 5 minutes before the time limit the job is requeued, Test.py resumes its search from the checkpoint
+trap 'echo "Time limit reached, requeueing job $SLURM_JOB_ID"; scontrol requeue $SLURM_JOB_ID; exit 0' USR1
+
+# Run your Python script, in the background so the trap is handled while it runs
+python /home/users/elicina/Master-Thesis/Source/Ticket-Classification/ML-models/Test.py &
+wait $! || print_error_and_exit "Python script execution failed"
  
@@ -0,0 +1,44 @@
+#!/bin/bash -l
+#SBATCH --job-name=Search-Queue
+#SBATCH --partition=batch
+#SBATCH --qos=normal
+#SBATCH -N 4
+#SBATCH --ntasks-per-node=12
+#SBATCH -c 1
+#SBATCH -t 180
+#SBATCH --export=ALL
+#SBATCH --requeue
+#SBATCH --signal=B:USR1@300
+
+
+print_error_and_exit() { echo "***ERROR*** $*"; exit 1; }
+module purge || print_error_and_exit "No 'module' command"
+
+# Load necessary modules
+module load lang/Python
+
+# Activate the virtual environment
+source /home/users/elicina/.virtualenvs/Master-Thesis/bin/activate || print_error_and_exit "Failed to activate virtual environment"
+
+# Work queue on the shared file system, the closed marker of the previous run is removed so the workers wait for work
+export SEARCH_MODE=queue
+export QUEUE_DIR=/home/users/elicina/Master-Thesis/Models/Search-Queue
+mkdir -p $QUEUE_DIR && rm -f $QUEUE_DIR/closed
+
+# 5 minutes before the time limit the job is requeued, the finished fits stay in the queue and the claimed ones are
+# queued again by the restarted search
+trap 'echo "Time limit reached, requeueing job $SLURM_JOB_ID"; scontrol requeue $SLURM_JOB_ID; exit 0' USR1
+
+# Search driver: puts the fits of every classifier into the queue, merges the results and evaluates the best models
+python /home/users/elicina/Master-Thesis/Source/Ticket-Classification/ML-models/Test.py &
+driver_pid=$!
+
+# One worker per task on all nodes, each fits one (candidate, fold) at a time and takes the next one when done.
+# A worker waits for the next search while the driver refits and evaluates, it stops when the driver closes the
+# queue; the 3 hours without work (the time limit of the job) are only a safety net.
+srun python /home/users/elicina/Master-Thesis/Source/Ticket-Classification/Work_queue.py worker $QUEUE_DIR 10800 &
+workers_pid=$!
+
+# A failed driver closes the queue itself, the workers stop
+wait $driver_pid || { touch $QUEUE_DIR/closed; print_error_and_exit "Search driver failed"; }
+wait $workers_pid || print_error_and_exit "Search workers failed"